@@ -21,3 +21,5 @@ limitations under the License.
 
 
 from .binlogstream import BinLogStreamReader 
+from .asyncreader import AsyncBinLogStreamReader
+from .filereader import BinLogFileReader
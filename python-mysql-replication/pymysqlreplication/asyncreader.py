@@ -0,0 +1,159 @@
+import socket
+import asyncore
+
+from pymysql.err import raise_mysql_exception
+
+from .binlogstream import BinLogStreamReader
+from .packet import UINT24
+
+# Size of the chunks read from the socket
+RECV_SIZE = 256 * 1024
+# Payload size of a packet continued in the next one
+MAX_PACKET_SIZE = 0xffffff
+
+
+class RawPacket(object):
+    '''MySQL packet read by AsyncBinLogStreamReader, with the interface of
+    the pymysql packets used by BinLogPacketWrapper'''
+
+    def __init__(self, data):
+        self.__data = data
+
+    def get_all_data(self):
+        return self.__data
+
+    def is_ok_packet(self):
+        return self.__data[:1] == '\x00'
+
+    def is_error_packet(self):
+        return self.__data[:1] == '\xff'
+
+    def check_error(self):
+        if self.is_error_packet():
+            raise_mysql_exception(self.__data)
+
+
+class AsyncBinLogStreamReader(BinLogStreamReader):
+    '''Replication stream read by an asyncore loop, so a single thread can
+    follow many streams next to other asyncore channels.
+
+    The connection and the COM_BINLOG_DUMP command are sent like with
+    BinLogStreamReader, then the packets are read from the socket when
+    the loop says it's readable. on_event is called with each event
+    which is not filtered, in the binlog order, and with None at the end
+    of a non blocking stream. The options are the ones of
+    BinLogStreamReader, except read_ahead and decode_processes which
+    need threads or processes.
+
+        reader = AsyncBinLogStreamReader(handle_event, connection_settings = settings)
+        reader.start()
+        asyncore.loop()
+    '''
+
+    def __init__(self, on_event, map = None, **kwargs):
+        if kwargs.get("read_ahead") or kwargs.get("decode_processes"):
+            raise ValueError("AsyncBinLogStreamReader doesn't support read_ahead and decode_processes")
+        super(AsyncBinLogStreamReader, self).__init__(**kwargs)
+        self.__on_event = on_event
+        self.__map = map
+        self.__channel = None
+
+    def start(self):
+        '''Connect and add the stream to the asyncore map'''
+        self._connect_to_stream()
+        self.__channel = _StreamChannel(self, self._stream_connection.socket, self.__map)
+
+    def close(self):
+        if self.__channel is not None:
+            self.__channel.close_channel()
+            self.__channel = None
+        super(AsyncBinLogStreamReader, self).close()
+
+    def fetchone(self):
+        raise NotImplementedError("The events of AsyncBinLogStreamReader are given to on_event")
+
+    def _handle_packet(self, pkt):
+        pkt.check_error()
+        if not pkt.is_ok_packet():
+            # End of a non blocking stream
+            self.__channel.close_channel()
+            self.__channel = None
+            self._disconnect_stream()
+            self.__on_event(None)
+            return
+        binlog_event = self._parse_packet(pkt)
+        if binlog_event is not None:
+            self.__on_event(self._return_event(binlog_event))
+
+    def _handle_connection_lost(self):
+        '''Reconnect at the position of the last event'''
+        self.__channel.close_channel()
+        try:
+            self._disconnect_stream()
+        except socket.error:
+            pass
+        self.start()
+
+
+class _StreamChannel(asyncore.dispatcher):
+    '''Cut the data of the socket in MySQL packets'''
+
+    def __init__(self, reader, sock, map):
+        asyncore.dispatcher.__init__(self, sock, map)
+        self.__reader = reader
+        # Data received, not yet cut in packets
+        self.__chunks = []
+        self.__size = 0
+        # Size of the data needed to cut the next packet
+        self.__needed = 4
+        # Payload of a packet split in many packets
+        self.__payload = []
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        data = self.recv(RECV_SIZE)
+        if not data:
+            return
+        self.__chunks.append(data)
+        self.__size += len(data)
+        if self.__size < self.__needed:
+            return
+        buffer = ''.join(self.__chunks)
+        offset = 0
+        while len(buffer) - offset >= 4:
+            low, high = UINT24.unpack_from(buffer, offset)
+            length = low + (high << 16)
+            end = offset + 4 + length
+            if len(buffer) < end:
+                break
+            self.__payload.append(buffer[offset + 4:end])
+            offset = end
+            if length < MAX_PACKET_SIZE:
+                payload = ''.join(self.__payload)
+                self.__payload = []
+                self.__reader._handle_packet(RawPacket(payload))
+                if self.__chunks is None:
+                    # The channel was closed by the event handler
+                    return
+        buffer = buffer[offset:]
+        self.__chunks = [buffer]
+        self.__size = len(buffer)
+        if len(buffer) >= 4:
+            low, high = UINT24.unpack_from(buffer, 0)
+            self.__needed = 4 + low + (high << 16)
+        else:
+            self.__needed = 4
+
+    def handle_close(self):
+        self.__reader._handle_connection_lost()
+
+    def handle_error(self):
+        # Errors of the stream and of the event handlers are for the caller of the loop
+        raise
+
+    def close_channel(self):
+        '''Remove the channel from the map, the socket is closed with the connection'''
+        self.del_channel()
+        self.__chunks = None
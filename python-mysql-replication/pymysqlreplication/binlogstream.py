@@ -1,23 +1,75 @@
+import os
+import socket
 import struct
 import copy
+import collections
+import multiprocessing
 import pymysql
 import pymysql.cursors
 from pymysql.constants.COMMAND import *
 from pymysql.util import byte2int, int2byte
-from .packet import BinLogPacketWrapper
-from .constants.BINLOG import TABLE_MAP_EVENT
+from .packet import BinLogPacketWrapper, HEADER_SIZE, UINT32, UINT64
+from .cache import LRUCache
+from .readahead import PacketReadAhead, WAIT_TIMEOUT
+from .pipeline import decode_rows
+from .catalog import SchemaCatalog, SchemaCatalogError, apply_ddl
+from .eventfilter import EventFilter
+from .relay import RelayLog, RelayLogWriter, RelayLogReader
+from .decoder import ROW_FORMATS, TEMPORAL_FORMATS
+from .constants.BINLOG import TABLE_MAP_EVENT, QUERY_EVENT, ROTATE_EVENT, HEARTBEAT_LOG_EVENT
 from row_event import RowsEvent
-from event import QueryEvent
 
 
 class BinLogStreamReader(object):
     '''Connect to replication stream and read event'''
     
-    def __init__(self, connection_settings = {}, resume_stream = False, blocking = False, only_events = None, server_id = 255):
+    def __init__(self, connection_settings = {}, resume_stream = False, blocking = False, only_events = None, server_id = 255,
+            only_schemas = None, only_tables = None, preload_schemas = False, schema_catalog_file = None,
+            table_map_size = 4096, row_format = "dict", decimal_as_int = False,
+            temporal_format = "datetime", bit_as_int = False, raw_strings = False,
+            read_ahead = False, read_ahead_packets = 1024, read_ahead_bytes = 64 * 1024 * 1024,
+            decode_processes = 0, log_file = None, log_pos = None, relay_log_dir = None,
+            relay_log_segment_size = 256 * 1024 * 1024, heartbeat_period = None, read_timeout = None):
         '''
         resume_stream: Start for latest event of binlog or from older available event
         blocking: Read on stream is blocking
         only_events: Array of allowed events
+        only_schemas: Array of allowed schemas, default to the connection database
+        only_tables: Array of allowed tables
+        preload_schemas: Load the columns of all the allowed schemas in one query at start
+        schema_catalog_file: File where the columns informations are saved with their binlog position.
+            At start the catalog is read from it instead of the server. It must not have been saved
+            after the start position, the previous version of the file is read when the last one
+            is after log_file and log_pos
+        table_map_size: Maximum number of table ids and table layouts kept in memory
+        row_format: Layout of the decoded rows: "dict" (default), "tuple", "record" or "lazy".
+            See RowsEvent
+        decimal_as_int: Decode DECIMAL values as integers scaled by 10 ** scale
+            instead of decimal.Decimal, the scale is in the column decimals
+        temporal_format: Type of the DATETIME, DATE, TIME and TIMESTAMP values: "datetime" (default)
+            for datetime objects, "raw" for the integers stored in the rows or "epoch" for epoch
+            seconds, seconds of the day for TIME. DATETIME are taken as UTC
+        bit_as_int: Decode BIT values as integers instead of strings like '0101'
+        raw_strings: Return the CHAR, VARCHAR, TEXT, BLOB and GEOMETRY values as memoryview on
+            the packet, without copy and not decoded from the column character set
+        read_ahead: Read the packets from the network in a thread while the events are decoded
+        read_ahead_packets: Maximum number of packets read ahead
+        read_ahead_bytes: Maximum size of the packets read ahead
+        decode_processes: Decode the rows in a pool of processes. The events are still returned in
+            the binlog order. A blocking stream reads ahead. The lazy rows and raw_strings values are
+            decoded by the reader
+        log_file: Binlog file to start from, with log_pos. Use the log_file and log_pos of an
+            event or of the reader to restart after it
+        log_pos: Position in log_file to start from. The rows events need the TableMapEvent before
+            them, start between two transactions, like after an XidEvent
+        relay_log_dir: Directory of a RelayLog. The stream is copied there by a thread as fast as
+            the network allows, and the events are read from there. A restarted reader continues
+            the copy where it stopped. Use relay_log.purge to remove the events applied
+        relay_log_segment_size: Size of the segment files of the relay log
+        heartbeat_period: Seconds after which the master sends a heartbeat when it has no event
+            to send, so a blocking stream can tell a silent master from a dead connection
+        read_timeout: Seconds without any packet after which the connection is taken as dead and
+            opened again at the position of the last event read. Twice heartbeat_period by default
         '''
         self.__connection_settings = connection_settings
         self.__connection_settings['charset'] = 'utf8'
@@ -28,26 +80,135 @@ class BinLogStreamReader(object):
         self.__connected = False
         self.__resume_stream = resume_stream
         self.__blocking = blocking
-        self.__only_events = only_events
         self.__server_id = server_id
-        self.__log_pos = None
+        if only_schemas is None and connection_settings.get('db') is not None:
+            only_schemas = [connection_settings['db']]
+        self.__only_schemas = only_schemas
+        self.__only_tables = only_tables
+        if row_format not in ROW_FORMATS:
+            raise ValueError("Unknown row format: %s" % (row_format))
+        self.__row_format = row_format
+        if temporal_format not in TEMPORAL_FORMATS:
+            raise ValueError("Unknown temporal format: %s" % (temporal_format))
+        self.__decoder_options = {"decimal_as_int": decimal_as_int, "temporal_format": temporal_format,
+            "bit_as_int": bit_as_int, "raw_strings": raw_strings}
+        # Position after the last event returned
+        self.__log_file = log_file
+        self.__log_pos = log_pos
+        # Position after the last event read from the stream, where to reconnect
+        self.__stream_log_file = log_file
+        self.__stream_log_pos = log_pos
+        self.__heartbeat_period = heartbeat_period
+        if read_timeout is None and heartbeat_period is not None:
+            read_timeout = heartbeat_period * 2
+        self.__read_timeout = read_timeout
+        self.__read_ahead = read_ahead
+        self.__read_ahead_packets = read_ahead_packets
+        self.__read_ahead_bytes = read_ahead_bytes
+        self.__packet_reader = None
+        # Events read, by order, with the result of the decoding of their rows
+        self.__decoding = collections.deque()
+        self.__decode_window = decode_processes * 4
+        self.__end_of_stream = False
+        self.__decode_pool = None
+        self.__decode_processes = decode_processes
+        # Ids of the decoders kept by each decoding process, by pid, as
+        # told by the process with its last results
+        self.__process_decoders = {}
+        if decode_processes > 0:
+            if blocking:
+                # Else we would wait for the next event with decoded events to return
+                self.__read_ahead = True
+            if row_format != "lazy" and not raw_strings:
+                self.__decode_pool = multiprocessing.Pool(decode_processes)
+
+        self.relay_log = None
+        if relay_log_dir is not None:
+            if read_ahead or decode_processes:
+                raise ValueError("The relay log doesn't support read_ahead and decode_processes")
+            self.relay_log = RelayLog(relay_log_dir, relay_log_segment_size)
+        self.__relay_writer = None
+        self.__relay_reader = None
 
         #Store table meta informations
-        self.table_map = {}
+        self.table_map = LRUCache(table_map_size)
+        self.__event_filter = EventFilter(self.table_map, only_events, only_schemas, only_tables)
+        self.__layout_cache = LRUCache(table_map_size)
+        self.__schema_catalog_file = schema_catalog_file
+        # Position the catalog is valid at, the one of the last DDL applied or
+        # of the first event read. Set and checked at the first event read
+        self.__catalog_position = None
+        if schema_catalog_file is not None and SchemaCatalog.saved(schema_catalog_file):
+            self.schema_catalog = SchemaCatalog.from_file(schema_catalog_file, log_file, log_pos)
+        else:
+            self.schema_catalog = SchemaCatalog()
+            if preload_schemas:
+                self.schema_catalog.load(self.__ctl_connection, self.__only_schemas)
 
     def close(self):
+        self.__save_schema_catalog()
+        self._disconnect_stream()
+        if self.__relay_writer is not None:
+            # Closes the relay log once its thread stopped writing
+            self.__relay_writer.stop()
+            self.__relay_reader.close()
+            self.__relay_writer = None
+            self.__relay_reader = None
+        elif self.relay_log is not None:
+            self.relay_log.close()
+        self.__ctl_connection.close()
+        if self.__decode_pool is not None:
+            self.__decode_pool.terminate()
+            self.__decode_pool = None
+
+    def _disconnect_stream(self):
+        '''Close the stream connection, the next read reconnects at the
+        stream position of the last event read, which is after the last
+        event returned when events wait for their decoding'''
         if self.__connected:
-            self._stream_connection.close()
+            self.__stop_read_ahead()
             self.__connected = False
-        self.__ctl_connection.close()
+            self._stream_connection.close()
+
+    @property
+    def log_file(self):
+        '''Binlog file of the position after the last event returned'''
+        return self.__log_file
 
-    def __connect_to_stream(self):
-        self._stream_connection = pymysql.connect(**self.__connection_settings)
-        cur = self._stream_connection.cursor()
-        cur.execute("SHOW MASTER STATUS")
-        (log_file, log_pos) = cur.fetchone()[:2]
-        cur.close()
+    @property
+    def log_pos(self):
+        '''Position after the last event returned, to restart from'''
+        return self.__log_pos
 
+    def _connect_to_stream(self):
+        (self._stream_connection, self.__stream_log_file, self.__stream_log_pos) = \
+                self._open_dump(self.__stream_log_file, self.__stream_log_pos)
+        self.__connected = True
+        if self.__read_ahead:
+            self.__packet_reader = PacketReadAhead(self._stream_connection,
+                    self.__read_ahead_packets, self.__read_ahead_bytes)
+        else:
+            self.__packet_reader = self._stream_connection
+
+    def _open_dump(self, log_file, log_pos):
+        '''Open a connection streaming the binlog from log_file and log_pos,
+        from the position of the master when log_file is None. Return the
+        connection and the position'''
+        connection = pymysql.connect(**self.__connection_settings)
+        if log_file is None:
+            cur = connection.cursor()
+            cur.execute("SHOW MASTER STATUS")
+            (log_file, master_log_pos) = cur.fetchone()[:2]
+            cur.close()
+            if log_pos is None and self.__resume_stream:
+                log_pos = master_log_pos
+        if log_pos is None:
+            log_pos = 4
+        if self.__heartbeat_period is not None:
+            cur = connection.cursor()
+            # The period is in nanoseconds
+            cur.execute("SET @master_heartbeat_period = %d" % (self.__heartbeat_period * 1000000000))
+            cur.close()
 
         # binlog_pos (4) -- position in the binlog-file to start the stream with
         # flags (2) BINLOG_DUMP_NON_BLOCK (0 or 1)
@@ -56,67 +217,189 @@ class BinLogStreamReader(object):
         command = COM_BINLOG_DUMP
         prelude = struct.pack('<i', len(log_file) + 11) \
                 + int2byte(command)
-        if self.__log_pos is None:
-            if self.__resume_stream:
-                prelude += struct.pack('<I', log_pos)            
-            else:
-                prelude += struct.pack('<I', 4)
-        else:
-            prelude += struct.pack('<I', self.__log_pos)
+        prelude += struct.pack('<I', log_pos)
         if self.__blocking:
             prelude += struct.pack('<h', 0)
         else:
             prelude += struct.pack('<h', 1)        
         prelude += struct.pack('<I', self.__server_id)
-        self._stream_connection.wfile.write(prelude + log_file.encode())
-        self._stream_connection.wfile.flush()
-        self.__connected = True
+        connection.wfile.write(prelude + log_file.encode())
+        connection.wfile.flush()
+        if self.__read_timeout is not None:
+            connection.socket.settimeout(self.__read_timeout)
+        return (connection, log_file, log_pos)
+
+    def __stop_read_ahead(self):
+        if isinstance(self.__packet_reader, PacketReadAhead):
+            self.__packet_reader.stop()
+        self.__packet_reader = None
         
     def fetchone(self):
+        if self.relay_log is not None:
+            return self.__fetch_relayed()
         while True:
+            if len(self.__decoding) > 0 and not self.__can_read_ahead():
+                return self.__next_decoded_event()
+            if self.__end_of_stream:
+                self.__end_of_stream = False
+                return None
             if self.__connected == False:
-                self.__connect_to_stream()
+                self._connect_to_stream()
             pkt = None
             try:
-                pkt = self._stream_connection.read_packet()
+                pkt = self.__packet_reader.read_packet()
             except pymysql.OperationalError as (code, message): 
                 if code == 2013: #2013: Connection Lost
+                    self.__stop_read_ahead()
                     self.__connected = False
                     continue
+            except socket.timeout:
+                # Nothing read, not even a heartbeat, the connection can be half open
+                try:
+                    self._disconnect_stream()
+                except socket.error:
+                    self.__connected = False
+                continue
             if not pkt.is_ok_packet():
-                return None
-            # When reading TableMapEvents from the stream, this line can throw an error
-            # if we are running a query on a modified version of a table. For example, if
-            # we originally had a table with two columns, wrote to it, then modified it to
-            # remove a column, then the TableMapEvent constructor would throw an error because
-            # it uses the current table schema. Thus we continue the loop if we get an error
-            try:
-                binlog_event = BinLogPacketWrapper(pkt, self.table_map, self.__ctl_connection)
-            except:
+                # Return the events still decoded first
+                self.__end_of_stream = True
+                continue
+            binlog_event = self._parse_packet(pkt)
+            if binlog_event is None:
                 continue
-            if binlog_event.event_type == TABLE_MAP_EVENT:
-                self.table_map[binlog_event.event.table_id] = binlog_event.event
-            if self.__filter_event(binlog_event.event):
+            if self.__decode_pool is not None and \
+                    (isinstance(binlog_event.event, RowsEvent) or len(self.__decoding) > 0):
+                self.__decode(binlog_event)
                 continue
-            self.__log_pos = binlog_event.log_pos
-            return binlog_event.event
-
-    def __filter_event(self, event):
-        # If it's a RowsEvent or QueryEvent, the event database must match the
-        # connection database
-        if isinstance(event, RowsEvent) and \
-                self.__connection_settings['db'] != self.table_map[event.table_id].schema:
-                    return True
-        elif isinstance(event, QueryEvent) and \
-                self.__connection_settings['db'] != event.schema:
-                    return True
-        elif self.__only_events is not None:
-            for allowed_event in self.__only_events:
-                if isinstance(event, allowed_event):
-                    return False
-            return True
-
-        return False
+            return self._return_event(binlog_event)
+
+    def __fetch_relayed(self):
+        '''Return the next event of the relay log'''
+        if self.__relay_writer is None:
+            open_dump = lambda log_file, log_pos: self._open_dump(log_file, log_pos)[0]
+            self.__relay_writer = RelayLogWriter(self.relay_log, open_dump,
+                    self.__stream_log_file, self.__stream_log_pos)
+            self.__relay_reader = RelayLogReader(self.relay_log,
+                    self.__stream_log_file, self.__stream_log_pos)
+        while True:
+            pkt = self.__relay_reader.read_packet()
+            if pkt is None:
+                return None
+            binlog_event = self._parse_packet(pkt)
+            if binlog_event is not None:
+                return self._return_event(binlog_event)
+
+    def _parse_packet(self, pkt):
+        '''Parse the event of an OK packet of the stream. Return its
+        BinLogPacketWrapper, or None if the event is filtered. Raise
+        SchemaCatalogError if the columns of its table can't be known'''
+        # Heartbeats only keep the connection alive
+        if byte2int(pkt.get_all_data()[5]) == HEARTBEAT_LOG_EVENT:
+            return None
+        self.__update_stream_position(pkt)
+        if self.__event_filter.filter_header(pkt.get_all_data(), 1):
+            return None
+        # A TableMapEvent of a table changed since, whose columns are no
+        # longer known, can't be skipped: the rows of the table would be lost
+        try:
+            binlog_event = BinLogPacketWrapper(pkt, self.table_map, self.__ctl_connection,
+                    only_schemas = self.__only_schemas, only_tables = self.__only_tables,
+                    schema_catalog = self.schema_catalog, layout_cache = self.__layout_cache,
+                    row_format = self.__row_format, decoder_options = self.__decoder_options)
+        except SchemaCatalogError as e:
+            raise SchemaCatalogError("%s, at %s:%s" % (e, self.__stream_log_file, self.__stream_log_pos))
+        binlog_event.event.log_file = self.__stream_log_file
+        binlog_event.event.log_pos = self.__stream_log_pos
+        if binlog_event.event_type == TABLE_MAP_EVENT:
+            self.__event_filter.add_table_map(binlog_event.event)
+        elif binlog_event.event_type == QUERY_EVENT:
+            self.__apply_ddl(binlog_event)
+        if self.__event_filter.filter_event(binlog_event.event):
+            return None
+        return binlog_event
+
+    def _return_event(self, binlog_event):
+        '''Record the position of an event given to the caller'''
+        self.__log_file = binlog_event.event.log_file
+        self.__log_pos = binlog_event.event.log_pos
+        return binlog_event.event
+
+    def __update_stream_position(self, pkt):
+        '''Move the stream position after an event, before it's filtered'''
+        data = pkt.get_all_data()
+        if byte2int(data[5]) == ROTATE_EVENT:
+            body = 1 + HEADER_SIZE
+            self.__stream_log_pos = UINT64.unpack_from(data, body)[0]
+            self.__stream_log_file = data[body + 8:]
+            return
+        # The events sent at the start of the stream have no position
+        log_pos = UINT32.unpack_from(data, 14)[0]
+        if log_pos != 0:
+            if self.__catalog_position is None:
+                self.schema_catalog.check_position(self.__stream_log_file, self.__stream_log_pos)
+                self.__catalog_position = (self.__stream_log_file, self.__stream_log_pos)
+                if self.schema_catalog.log_file is not None:
+                    self.__catalog_position = (self.schema_catalog.log_file, self.schema_catalog.log_pos)
+            self.__stream_log_pos = log_pos
+
+    def __decode(self, binlog_event):
+        '''Send the rows of an event to the decoding processes. The events
+        following it wait their turn with it'''
+        result = None
+        if isinstance(binlog_event.event, RowsEvent):
+            # The columns are pickled until every process has the decoder
+            decoder_id = binlog_event.event.decoder.id
+            holders = sum(1 for decoder_ids in self.__process_decoders.values()
+                if decoder_id in decoder_ids)
+            with_columns = holders < self.__decode_processes
+            result = self.__decode_pool.apply_async(decode_rows,
+                    (binlog_event.event._decode_task(with_columns),))
+        self.__decoding.append((binlog_event, result))
+
+    def __can_read_ahead(self):
+        '''True if another event can be read before returning the first event
+        waiting for its decoding'''
+        result = self.__decoding[0][1]
+        if result is None or result.ready():
+            return False
+        if not self.__connected or self.__end_of_stream or len(self.__decoding) >= self.__decode_window:
+            return False
+        # Don't wait for the next event of a blocking stream
+        return not self.__blocking or self.__packet_reader.pending()
+
+    def __next_decoded_event(self):
+        binlog_event, result = self.__decoding.popleft()
+        if result is not None:
+            images = self.__decoded_images(result.get(WAIT_TIMEOUT))
+            if images is None:
+                # The process evicted the decoder after telling it had it
+                images = self.__decoded_images(self.__decode_pool.apply(decode_rows,
+                    (binlog_event.event._decode_task(),)))
+            binlog_event.event._set_decoded_images(images)
+        return self._return_event(binlog_event)
+
+    def __decoded_images(self, result):
+        '''Return the images of a result of decode_rows, after remembering
+        the decoders of its process'''
+        pid, decoder_ids, images = result
+        if decoder_ids is not None:
+            self.__process_decoders[pid] = set(decoder_ids)
+        return images
+
+    def __apply_ddl(self, binlog_event):
+        '''Keep the schema catalog and the table map up to date with DDL queries'''
+        event = binlog_event.event
+        if len(apply_ddl(self.schema_catalog, self.table_map, self.__layout_cache, event)) > 0:
+            self.__catalog_position = (event.log_file, event.log_pos)
+            self.__save_schema_catalog()
+
+    def __save_schema_catalog(self):
+        '''Save the catalog at the stream position of the last DDL applied,
+        which can be after the last event returned when events are read
+        ahead'''
+        if self.__schema_catalog_file is None or self.__catalog_position is None:
+            return
+        self.schema_catalog.save(self.__schema_catalog_file, *self.__catalog_position)
 
     def __iter__(self):
         return iter(self.fetchone, None)
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    '''Dictionary keeping at most maxsize items. When full, the least
+    recently used item is evicted. A maxsize of None means no limit.
+
+    Pinned items are never evicted, the cache grows over maxsize when
+    they are all pinned.'''
+
+    def __init__(self, maxsize = None):
+        self.maxsize = maxsize
+        self.__items = OrderedDict()
+        self.__pinned = set()
+
+    def __getitem__(self, key):
+        value = self.__items.pop(key)
+        self.__items[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self.__items.pop(key, None)
+        self.__items[key] = value
+        self.__evict()
+
+    def __evict(self):
+        if self.maxsize is None:
+            return
+        while len(self.__items) > self.maxsize:
+            for key in self.__items:
+                if key not in self.__pinned:
+                    break
+            else:
+                return
+            del self.__items[key]
+
+    def __delitem__(self, key):
+        del self.__items[key]
+        self.__pinned.discard(key)
+
+    def __contains__(self, key):
+        return key in self.__items
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __iter__(self):
+        return iter(self.__items)
+
+    def get(self, key, default = None):
+        if key in self.__items:
+            return self[key]
+        return default
+
+    def pop(self, key, default = None):
+        self.__pinned.discard(key)
+        return self.__items.pop(key, default)
+
+    def pin(self, key):
+        '''Keep the item of key until unpin_all'''
+        self.__pinned.add(key)
+
+    def unpin_all(self):
+        self.__pinned.clear()
+        self.__evict()
+
+    def keys(self):
+        return list(self.__items.keys())
+
+    def values(self):
+        return list(self.__items.values())
+
+    def items(self):
+        return list(self.__items.items())
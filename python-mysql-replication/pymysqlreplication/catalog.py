@@ -0,0 +1,292 @@
+import os
+import re
+import json
+
+from pymysql.constants import FIELD_TYPE
+
+# Identifier, quoted or not, and optionally qualified by its schema
+NAME = r'(?:`(?:[^`]|``)+`|[\w$]+)'
+QUALIFIED_NAME = r'%s(?:\s*\.\s*%s)?' % (NAME, NAME)
+
+DDL_RE = re.compile(r'^\s*(?:ALTER|CREATE|DROP|RENAME)\s', re.I)
+ALTER_TABLE_RE = re.compile(r'^\s*ALTER\s+(?:ONLINE\s+|OFFLINE\s+)?(?:IGNORE\s+)?TABLE\s+(%s)' % QUALIFIED_NAME, re.I)
+CREATE_TABLE_RE = re.compile(r'^\s*CREATE\s+(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(%s)' % QUALIFIED_NAME, re.I)
+DROP_TABLE_RE = re.compile(r'^\s*DROP\s+(?:TEMPORARY\s+)?TABLES?\s+(?:IF\s+EXISTS\s+)?((?:%s\s*,\s*)*%s)' % (QUALIFIED_NAME, QUALIFIED_NAME), re.I)
+RENAME_TABLE_RE = re.compile(r'^\s*RENAME\s+TABLES?\s+(.*)$', re.I | re.S)
+RENAME_PAIR_RE = re.compile(r'^\s*(%s)\s+TO\s+(%s)\s*$' % (QUALIFIED_NAME, QUALIFIED_NAME), re.I)
+DROP_DATABASE_RE = re.compile(r'^\s*DROP\s+(?:DATABASE|SCHEMA)\s+(?:IF\s+EXISTS\s+)?(%s)' % NAME, re.I)
+NAME_RE = re.compile(NAME)
+# Spaces and comments before the statement. The content of the /*! */
+# comments is run by MySQL, only their opening is skipped
+LEADING_COMMENTS_RE = re.compile(r'(?:\s+|/\*!\d*|/\*.*?\*/|--(?=\s)[^\n]*|#[^\n]*)*', re.S)
+
+# Temporal types of MySQL 5.6 with fractional seconds
+TIMESTAMP2 = 17
+DATETIME2 = 18
+TIME2 = 19
+
+# Types of the TableMapEvent columns for each DATA_TYPE of information_schema.
+# CHAR, BINARY, ENUM and SET are all STRING, their real type is in the metadata
+COLUMN_TYPES = {
+    "tinyint": (FIELD_TYPE.TINY,),
+    "smallint": (FIELD_TYPE.SHORT,),
+    "mediumint": (FIELD_TYPE.INT24,),
+    "int": (FIELD_TYPE.LONG,),
+    "integer": (FIELD_TYPE.LONG,),
+    "bigint": (FIELD_TYPE.LONGLONG,),
+    "float": (FIELD_TYPE.FLOAT,),
+    "double": (FIELD_TYPE.DOUBLE,),
+    "real": (FIELD_TYPE.DOUBLE,),
+    "decimal": (FIELD_TYPE.NEWDECIMAL, FIELD_TYPE.DECIMAL),
+    "numeric": (FIELD_TYPE.NEWDECIMAL, FIELD_TYPE.DECIMAL),
+    "bit": (FIELD_TYPE.BIT,),
+    "date": (FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE),
+    "time": (FIELD_TYPE.TIME, TIME2),
+    "datetime": (FIELD_TYPE.DATETIME, DATETIME2),
+    "timestamp": (FIELD_TYPE.TIMESTAMP, TIMESTAMP2),
+    "year": (FIELD_TYPE.YEAR,),
+    "char": (FIELD_TYPE.STRING,),
+    "binary": (FIELD_TYPE.STRING,),
+    "enum": (FIELD_TYPE.STRING,),
+    "set": (FIELD_TYPE.STRING,),
+    "varchar": (FIELD_TYPE.VARCHAR, FIELD_TYPE.VAR_STRING),
+    "varbinary": (FIELD_TYPE.VARCHAR, FIELD_TYPE.VAR_STRING),
+    "tinytext": (FIELD_TYPE.BLOB,),
+    "text": (FIELD_TYPE.BLOB,),
+    "mediumtext": (FIELD_TYPE.BLOB,),
+    "longtext": (FIELD_TYPE.BLOB,),
+    "tinyblob": (FIELD_TYPE.BLOB,),
+    "blob": (FIELD_TYPE.BLOB,),
+    "mediumblob": (FIELD_TYPE.BLOB,),
+    "longblob": (FIELD_TYPE.BLOB,),
+}
+
+
+def strip_comments(query):
+    '''The query without the spaces and comments before its statement'''
+    return query[LEADING_COMMENTS_RE.match(query).end():]
+
+
+def is_ddl(query):
+    '''True if the query can change the structure of tables'''
+    return DDL_RE.match(strip_comments(query)) is not None
+
+
+def compare_positions(a, b):
+    '''Compare two (log_file, log_pos) of the master. The binlog files
+    of a server have the same base name and an increasing number'''
+    return cmp(tuple(a), tuple(b))
+
+
+def columns_match(column_schemas, column_types):
+    '''True if the column informations describe the columns of a
+    TableMapEvent, with their number and types. Only the types known
+    from information_schema are compared'''
+    if column_schemas is None or len(column_schemas) != len(column_types):
+        return False
+    for column_schema, column_type in zip(column_schemas, column_types):
+        expected = COLUMN_TYPES.get(column_schema["DATA_TYPE"].lower())
+        if expected is not None and ord(column_type) not in expected:
+            return False
+    return True
+
+
+class SchemaCatalogError(ValueError):
+    '''The columns of a table can't be known as they were at a binlog position'''
+
+
+def _unquote(name):
+    if name.startswith('`'):
+        return name[1:-1].replace('``', '`')
+    return name
+
+
+def _split_name(schema, name):
+    '''Return the (schema, table) of a possibly qualified table name'''
+    parts = [_unquote(part) for part in NAME_RE.findall(name)]
+    if len(parts) == 2:
+        return (parts[0], parts[1])
+    return (schema, parts[0])
+
+
+def apply_ddl(schema_catalog, table_map, layout_cache, event):
+    '''Apply the DDL of a QueryEvent to the schema catalog of a reader,
+    and forget the table maps and table layouts of the changed tables.
+    Return the list of the (schema, table) changed'''
+    changed = schema_catalog.apply_query(event.schema, event.query)
+    for table_id, table_map_event in table_map.items():
+        if (table_map_event.schema, table_map_event.table) in changed:
+            del table_map[table_id]
+    for layout_key in layout_cache.keys():
+        if layout_key[:2] in changed:
+            del layout_cache[layout_key]
+    return changed
+
+
+class SchemaCatalog(object):
+    '''In memory copy of information_schema.columns for the replicated tables.
+
+    Column informations are grouped by (schema, table), ordered by column
+    position. TableMapEvent consults it before querying the server.
+
+    The catalog can be saved to a file with the binlog position it is
+    valid at, and is kept up to date with the DDL queries of the stream.'''
+
+    def __init__(self):
+        self.tables = {}
+        self.log_file = None
+        self.log_pos = None
+
+    def get(self, schema, table):
+        '''Return the column informations of a table or None if unknown'''
+        return self.tables.get((schema, table))
+
+    def set(self, schema, table, column_schemas):
+        self.tables[(schema, table)] = column_schemas
+
+    def load(self, ctl_connection, schemas = None):
+        '''Fetch in a single query the columns of all the tables
+        of the schemas. If schemas is None all the tables are loaded'''
+        query = "SELECT * FROM columns"
+        args = None
+        if schemas is not None:
+            schemas = list(schemas)
+            if len(schemas) == 0:
+                return
+            query += " WHERE table_schema IN (%s)" % (", ".join(["%s"] * len(schemas)))
+            args = schemas
+        query += " ORDER BY table_schema, table_name, ordinal_position"
+
+        cur = ctl_connection.cursor()
+        cur.execute(query, args)
+        tables = {}
+        for column_schema in cur.fetchall():
+            key = (column_schema["TABLE_SCHEMA"], column_schema["TABLE_NAME"])
+            tables.setdefault(key, []).append(column_schema)
+        cur.close()
+        self.tables.update(tables)
+
+    def fetch(self, ctl_connection, schema, table):
+        '''Query the columns of a table not yet in the catalog'''
+        cur = ctl_connection.cursor()
+        cur.execute("""SELECT * FROM columns WHERE table_schema = %s AND table_name = %s
+            ORDER BY ordinal_position""", (schema, table))
+        column_schemas = list(cur.fetchall())
+        cur.close()
+        # Don't remember missing tables, they can be created later
+        if len(column_schemas) > 0:
+            self.set(schema, table, column_schemas)
+        return column_schemas
+
+    def invalidate(self, schema, table):
+        self.tables.pop((schema, table), None)
+
+    def apply_query(self, schema, query):
+        '''Update the catalog for a DDL query run in schema.
+
+        Altered and created tables are forgotten, they will be fetched
+        again from the server when needed. The server has their current
+        columns, which can be later than the event, so TableMapEvent checks
+        them against the column types of the event and raises
+        SchemaCatalogError when they differ. A change keeping the types,
+        like a renamed column, is not detected. Renamed tables keep their
+        columns. Return the list of the (schema, table) changed.'''
+        query = strip_comments(query)
+        if not is_ddl(query):
+            return []
+
+        match = ALTER_TABLE_RE.match(query) or CREATE_TABLE_RE.match(query)
+        if match:
+            changed = [_split_name(schema, match.group(1))]
+        elif DROP_TABLE_RE.match(query):
+            names = DROP_TABLE_RE.match(query).group(1).split(',')
+            changed = [_split_name(schema, name) for name in names]
+        elif RENAME_TABLE_RE.match(query):
+            changed = []
+            for pair in RENAME_TABLE_RE.match(query).group(1).split(','):
+                match = RENAME_PAIR_RE.match(pair)
+                if match is None:
+                    continue
+                old = _split_name(schema, match.group(1))
+                new = _split_name(schema, match.group(2))
+                column_schemas = self.tables.pop(old, None)
+                self.tables.pop(new, None)
+                if column_schemas is not None:
+                    self.tables[new] = column_schemas
+                changed.extend([old, new])
+            return changed
+        elif DROP_DATABASE_RE.match(query):
+            dropped = _unquote(DROP_DATABASE_RE.match(query).group(1))
+            changed = [key for key in self.tables if key[0] == dropped]
+        else:
+            return []
+
+        for key in changed:
+            self.tables.pop(key, None)
+        return changed
+
+    def check_position(self, log_file, log_pos):
+        '''Raise SchemaCatalogError if the catalog was saved after the
+        binlog position (log_file, log_pos), where reading starts. The
+        events before the catalog position would be decoded with the
+        columns of later DDL'''
+        if self.log_file is None or log_file is None:
+            return
+        if compare_positions((self.log_file, self.log_pos), (log_file, log_pos)) > 0:
+            raise SchemaCatalogError("The schema catalog is at %s:%d, after the start position %s:%d"
+                % (self.log_file, self.log_pos, log_file, log_pos))
+
+    def save(self, path, log_file, log_pos):
+        '''Write the catalog in a file with the binlog position it is valid at.
+
+        The file is replaced atomically.'''
+        self.log_file = log_file
+        self.log_pos = log_pos
+        snapshot = {
+            "log_file": log_file,
+            "log_pos": log_pos,
+            "tables": [{"schema": schema, "table": table, "columns": columns}
+                for (schema, table), columns in self.tables.items()]
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, default = str)
+            f.flush()
+            os.fsync(f.fileno())
+        # The previous version is kept for a restart before this position
+        if os.path.exists(path):
+            os.rename(path, path + ".prev")
+        os.rename(tmp_path, path)
+
+    @staticmethod
+    def saved(path):
+        '''True if a catalog was saved in path'''
+        return os.path.exists(path) or os.path.exists(path + ".prev")
+
+    @classmethod
+    def from_file(cls, path, log_file = None, log_pos = None):
+        '''Load a catalog saved with save. With a binlog position, the
+        previous version is loaded when the last one was saved after it,
+        like when a reader stopped before its checkpoint reached the last
+        DDL. Else the last version is loaded.'''
+        versions = [version for version in (path, path + ".prev") if os.path.exists(version)]
+        if len(versions) == 0:
+            raise IOError("No schema catalog saved in %s" % (path))
+        for version in versions:
+            catalog = cls.__read(version)
+            if log_file is None or catalog.log_file is None or \
+                    compare_positions((catalog.log_file, catalog.log_pos), (log_file, log_pos)) <= 0:
+                return catalog
+        # All saved after the position, check_position rejects it
+        return cls.__read(versions[0])
+
+    @classmethod
+    def __read(cls, path):
+        with open(path) as f:
+            snapshot = json.load(f)
+        catalog = cls()
+        catalog.log_file = snapshot["log_file"]
+        catalog.log_pos = snapshot["log_pos"]
+        for table in snapshot["tables"]:
+            catalog.set(table["schema"], table["table"], table["columns"])
+        return catalog
@@ -3,6 +3,9 @@ from pymysql.constants import FIELD_TYPE
 from pymysql.util import byte2int, int2byte 
 import csv
 
+# Csv dialect for parsing column schema strings
+csv.register_dialect('column_schema', quotechar="'", doublequote="''")
+
 class Column(object):
     '''Definition of a column'''
 
@@ -13,6 +16,8 @@ class Column(object):
         self.character_set_name = column_schema["CHARACTER_SET_NAME"]
         self.comment = column_schema["COLUMN_COMMENT"]
         self.unsigned = False
+        # Set by TableMapEvent from its null bitmap
+        self.nullable = True
 
         if column_schema["COLUMN_TYPE"].find("unsigned") != -1:
             self.unsigned = True
@@ -48,8 +53,6 @@ class Column(object):
             self.max_length = (((metadata >> 4) & 0x300) ^ 0x300) + (metadata & 0x00ff)
 
     def __read_enum_metadata(self, column_schema):
-        # Creates a csv dialect for parsing column schema strings
-        csv.register_dialect('column_schema', quotechar="'", doublequote="''")
         enums = column_schema["COLUMN_TYPE"]
         if self.type == FIELD_TYPE.ENUM:
             self.enum_values = csv.reader([enums[5:-1]], dialect='column_schema').next()
@@ -27,3 +27,8 @@ WRITE_ROWS_EVENT = 0x17
 INCIDENT_EVENT = 0x1a
 HEARTBEAT_LOG_EVENT = 0x1b
 
+# Checksums of the events, since MySQL 5.6.1
+BINLOG_CHECKSUM_LEN = 4
+BINLOG_CHECKSUM_ALG_DESC_LEN = 1
+BINLOG_CHECKSUM_ALG_OFF = 0
+BINLOG_CHECKSUM_ALG_CRC32 = 1
@@ -0,0 +1,679 @@
+import struct
+import decimal
+import datetime
+import calendar
+import collections
+import itertools
+import array
+
+from pymysql.constants import FIELD_TYPE
+from .cache import LRUCache
+from .packetreader import PacketReader
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Precompiled readers, shared by every decoding plan
+INT8 = struct.Struct('<b')
+UINT8 = struct.Struct('<B')
+INT16 = struct.Struct('<h')
+UINT16 = struct.Struct('<H')
+INT32 = struct.Struct('<i')
+UINT32 = struct.Struct('<I')
+INT64 = struct.Struct('<q')
+UINT64 = struct.Struct('<Q')
+FLOAT = struct.Struct('<f')
+DOUBLE = struct.Struct('<d')
+BE_INT8 = struct.Struct('>b')
+BE_INT16 = struct.Struct('>h')
+BE_INT24 = struct.Struct('>bH')
+BE_INT32 = struct.Struct('>i')
+UINT64_BE = struct.Struct('>Q')
+
+
+# Fixed width numeric types used by the columnar decoding, as
+# (signed, unsigned) struct formats, array typecodes and numpy dtypes.
+# INT24 values are stored on 4 bytes, LONGLONG have no array typecode
+# when the C long is 4 bytes.
+FIXED_WIDTH_FORMATS = {
+    FIELD_TYPE.TINY: ('b', 'B'),
+    FIELD_TYPE.SHORT: ('h', 'H'),
+    FIELD_TYPE.LONG: ('i', 'I'),
+    FIELD_TYPE.LONGLONG: ('q', 'Q'),
+    FIELD_TYPE.FLOAT: ('f', 'f'),
+    FIELD_TYPE.DOUBLE: ('d', 'd'),
+}
+ARRAY_TYPECODES = {
+    FIELD_TYPE.TINY: ('b', 'B'),
+    FIELD_TYPE.SHORT: ('h', 'H'),
+    FIELD_TYPE.INT24: ('i', 'I'),
+    FIELD_TYPE.LONG: ('i', 'I'),
+    FIELD_TYPE.FLOAT: ('f', 'f'),
+    FIELD_TYPE.DOUBLE: ('d', 'd'),
+}
+if array.array('l').itemsize == 8:
+    ARRAY_TYPECODES[FIELD_TYPE.LONGLONG] = ('l', 'L')
+NUMPY_DTYPES = {
+    FIELD_TYPE.TINY: ('<i1', '<u1'),
+    FIELD_TYPE.SHORT: ('<i2', '<u2'),
+    FIELD_TYPE.INT24: ('<i4', '<u4'),
+    FIELD_TYPE.LONG: ('<i4', '<u4'),
+    FIELD_TYPE.LONGLONG: ('<i8', '<u8'),
+    FIELD_TYPE.FLOAT: ('<f4', '<f4'),
+    FIELD_TYPE.DOUBLE: ('<f8', '<f8'),
+}
+
+# Options changing how the values are decoded:
+# decimal_as_int: DECIMAL are integers scaled by 10 ** scale instead
+#   of decimal.Decimal
+# temporal_format: DATETIME, DATE, TIME and TIMESTAMP values are
+#   datetime objects (default), the integer stored in the row (raw)
+#   or seconds since epoch, seconds of the day for TIME (epoch)
+# bit_as_int: BIT values are integers instead of strings like '0101'
+# raw_strings: CHAR, VARCHAR, TEXT, BLOB and GEOMETRY values are memoryview
+#   windows on the packet, not decoded from their character set
+DECODER_OPTIONS = ("decimal_as_int", "temporal_format", "bit_as_int", "raw_strings")
+TEMPORAL_FORMATS = ("datetime", "raw", "epoch")
+# Number of converted values memoized per temporal column
+TEMPORAL_CACHE_SIZE = 1024
+
+# Formats of the decoded rows:
+# dict: a dict column name => value
+# tuple: a tuple of the values in the column order
+# record: a namedtuple per table layout, values are attributes
+# lazy: a LazyRow per row image, values are decoded when accessed
+ROW_FORMATS = ("dict", "tuple", "record", "lazy")
+# Formats where the images of a row are in a dict like {"values": ...}
+MAPPING_FORMATS = ("dict", "lazy")
+
+
+# Unique ids of the decoders, to find them in other processes
+_decoder_ids = itertools.count(1)
+
+
+class RowDecoder(object):
+    '''Decoding plan for a table layout.
+
+    It's built once when the TableMapEvent arrive and contains for each
+    column a reader function. All the rows events for the table reuse it
+    instead of dispatching on the column type for each value.'''
+
+    def __init__(self, columns, **options):
+        self.id = next(_decoder_ids)
+        self.columns = columns
+        self.options = options
+        self.names = [column.name for column in columns]
+        self.decoders = [column_decoder(column, **options) for column in columns]
+        self.skippers = [column_skipper(column) for column in columns]
+        self.index = dict((self.names[i], i) for i in range(0, len(columns)))
+        self.plan = []
+        for i in range(0, len(columns)):
+            self.plan.append((self.names[i], i >> 3, 1 << (i & 7), self.decoders[i]))
+        self.__record_class = None
+        # Decoders of the partial row images, by columns present bitmap
+        self.__subsets = LRUCache(64)
+        self.__full_bitmap = bytes(bytearray(
+            [0xff] * (len(columns) >> 3) + ([(1 << (len(columns) & 7)) - 1] if len(columns) & 7 else [])))
+
+    def subset(self, columns_present_bitmap):
+        '''Return the decoder of the row images logging only the columns
+        set in the bitmap, like with binlog_row_image=MINIMAL or NOBLOB'''
+        bitmap = bytearray(columns_present_bitmap)
+        if len(self.columns) & 7:
+            # The bits after the last column are not significant
+            bitmap[-1] &= (1 << (len(self.columns) & 7)) - 1
+        key = bytes(bitmap)
+        if key == self.__full_bitmap:
+            return self
+        decoder = self.__subsets.get(key)
+        if decoder is None:
+            columns = [self.columns[i] for i in range(0, len(self.columns))
+                if bitmap[i >> 3] & (1 << (i & 7))]
+            decoder = RowDecoder(columns, **self.options)
+            self.__subsets[key] = decoder
+        return decoder
+
+    @property
+    def record_class(self):
+        '''namedtuple of the rows in record format. Column names which are not
+        valid identifiers are renamed to their position, like _1'''
+        if self.__record_class is None:
+            self.__record_class = collections.namedtuple("Row", self.names, rename = True)
+        return self.__record_class
+
+    def new_columns(self):
+        '''Return empty (values, nulls) columns for read_columns'''
+        values = []
+        nulls = []
+        for column in self.columns:
+            typecodes = ARRAY_TYPECODES.get(column.type)
+            if typecodes is None:
+                values.append([])
+            else:
+                values.append(array.array(typecodes[column.unsigned]))
+            nulls.append(array.array('B'))
+        return (values, nulls)
+
+    def read_columns(self, packet, null_bitmap, values, nulls):
+        '''Read one row image and append its values to columns created by
+        new_columns. NULL are stored as 0 in the numeric arrays'''
+        null_bitmap = bytearray(null_bitmap)
+        i = 0
+        for name, byte, bit, decode in self.plan:
+            if null_bitmap[byte] & bit:
+                nulls[i].append(1)
+                values[i].append(None if type(values[i]) is list else 0)
+            else:
+                nulls[i].append(0)
+                values[i].append(decode(packet))
+            i += 1
+
+    def fixed_width_format(self):
+        '''struct format of a row image when all the columns are NOT NULL
+        and of a fixed width numeric type, else None'''
+        fmt = ""
+        for column in self.columns:
+            formats = FIXED_WIDTH_FORMATS.get(column.type)
+            if formats is None or column.nullable:
+                return None
+            fmt += formats[column.unsigned]
+        return fmt
+
+    def reader(self, row_format):
+        '''Return the function reading one row image in the format'''
+        if row_format == "dict":
+            return self.read_values
+        elif row_format == "tuple":
+            return self.read_tuple
+        elif row_format == "record":
+            return self.read_record
+        elif row_format == "lazy":
+            return self.read_lazy
+        raise ValueError("Unknown row format: %s" % (row_format))
+
+    def read_values(self, packet, null_bitmap):
+        '''Read the values of one row image. Return a dict column name => value'''
+        null_bitmap = bytearray(null_bitmap)
+        values = {}
+        for name, byte, bit, decode in self.plan:
+            if null_bitmap[byte] & bit:
+                values[name] = None
+            else:
+                values[name] = decode(packet)
+        return values
+
+    def __read_list(self, packet, null_bitmap):
+        null_bitmap = bytearray(null_bitmap)
+        values = []
+        append = values.append
+        for name, byte, bit, decode in self.plan:
+            if null_bitmap[byte] & bit:
+                append(None)
+            else:
+                append(decode(packet))
+        return values
+
+    def read_tuple(self, packet, null_bitmap):
+        '''Read the values of one row image. Return a tuple in column order'''
+        return tuple(self.__read_list(packet, null_bitmap))
+
+    def read_record(self, packet, null_bitmap):
+        '''Read the values of one row image. Return a record_class instance'''
+        return self.record_class._make(self.__read_list(packet, null_bitmap))
+
+    def read_lazy(self, packet, null_bitmap):
+        '''Scan one row image without decoding it. Return a LazyRow'''
+        null_bitmap = bytearray(null_bitmap)
+        offsets = []
+        i = 0
+        for name, byte, bit, decode in self.plan:
+            if null_bitmap[byte] & bit:
+                offsets.append(None)
+            else:
+                offsets.append(packet.tell())
+                self.skippers[i](packet)
+            i += 1
+        offsets.append(packet.tell())
+        return LazyRow(self, packet.buffer, offsets)
+
+
+class LazyRow(object):
+    '''Row image decoded on access.
+
+    It behaves like the dict of the dict row format, but only keeps the
+    offset of each value in the packet. A value is decoded the first
+    time it's read, the others are never decoded. The row keeps a
+    reference on the whole packet.'''
+
+    def __init__(self, decoder, data, offsets):
+        self.__decoder = decoder
+        self.__data = data
+        # Offset of each column, None for NULL, and the end of the image
+        self.__offsets = offsets
+        self.__values = {}
+
+    def __value(self, i):
+        if i not in self.__values:
+            offset = self.__offsets[i]
+            if offset is None:
+                value = None
+            else:
+                value = self.__decoder.decoders[i](PacketReader(self.__data, offset))
+            self.__values[i] = value
+        return self.__values[i]
+
+    def __getitem__(self, name):
+        return self.__value(self.__decoder.index[name])
+
+    def get(self, name, default = None):
+        i = self.__decoder.index.get(name)
+        if i is None:
+            return default
+        return self.__value(i)
+
+    def is_null(self, name):
+        return self.__offsets[self.__decoder.index[name]] is None
+
+    def raw(self, name):
+        '''Undecoded bytes of a value in the packet, None for NULL'''
+        i = self.__decoder.index[name]
+        offset = self.__offsets[i]
+        if offset is None:
+            return None
+        end = next(o for o in self.__offsets[i + 1:] if o is not None)
+        return self.__data[offset:end]
+
+    def __contains__(self, name):
+        return name in self.__decoder.index
+
+    def __iter__(self):
+        return iter(self.__decoder.names)
+
+    def __len__(self):
+        return len(self.__decoder.names)
+
+    def keys(self):
+        return list(self.__decoder.names)
+
+    def values(self):
+        return [self.__value(i) for i in range(0, len(self.__decoder.names))]
+
+    def items(self):
+        return zip(self.__decoder.names, self.values())
+
+    def to_dict(self):
+        '''Decode all the values, return the row in dict format'''
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyRow):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "LazyRow(%r)" % (self.to_dict())
+
+
+class ColumnBatch(object):
+    '''Values of the rows of an event, stored by column.
+
+    values contains one array per column: an array.array (or a numpy
+    array) for the fixed width numeric types and a list for the other
+    types. nulls contains the null mask of each column, where 1 (or
+    True) is a NULL value. NULL are stored as 0 in the numeric arrays.'''
+
+    def __init__(self, names, values, nulls):
+        self.names = names
+        self.values = values
+        self.nulls = nulls
+
+    def __getitem__(self, name):
+        return self.values[self.names.index(name)]
+
+    def __len__(self):
+        if len(self.nulls) == 0:
+            return 0
+        return len(self.nulls[0])
+
+
+def column_decoder(column, **options):
+    '''Return a function reading a value of the column from a packet.
+    options are the DECODER_OPTIONS'''
+    if column.type == FIELD_TYPE.TINY:
+        return _struct_reader(UINT8 if column.unsigned else INT8)
+    elif column.type == FIELD_TYPE.SHORT:
+        return _struct_reader(UINT16 if column.unsigned else INT16)
+    elif column.type == FIELD_TYPE.LONG:
+        return _struct_reader(UINT32 if column.unsigned else INT32)
+    elif column.type == FIELD_TYPE.INT24:
+        if column.unsigned:
+            return lambda packet: packet.read_uint24()
+        return lambda packet: packet.read_int24()
+    elif column.type == FIELD_TYPE.FLOAT:
+        return _struct_reader(FLOAT)
+    elif column.type == FIELD_TYPE.DOUBLE:
+        return _struct_reader(DOUBLE)
+    elif column.type == FIELD_TYPE.VARCHAR or column.type == FIELD_TYPE.STRING:
+        if column.max_length > 255:
+            return _string_reader(2, column, options.get("raw_strings", False))
+        return _string_reader(1, column, options.get("raw_strings", False))
+    elif column.type == FIELD_TYPE.NEWDECIMAL:
+        return decimal_decoder(column, options.get("decimal_as_int", False))
+    elif column.type == FIELD_TYPE.BLOB:
+        return _string_reader(column.length_size, column, options.get("raw_strings", False))
+    elif column.type in (FIELD_TYPE.DATETIME, FIELD_TYPE.TIME, FIELD_TYPE.DATE, FIELD_TYPE.TIMESTAMP):
+        return temporal_decoder(column, options.get("temporal_format", "datetime"))
+    elif column.type == FIELD_TYPE.LONGLONG:
+        return _struct_reader(UINT64 if column.unsigned else INT64)
+    elif column.type == FIELD_TYPE.YEAR:
+        return lambda packet: packet.read_uint8() + 1900
+    elif column.type == FIELD_TYPE.ENUM:
+        return lambda packet: column.enum_values[packet.read_uint_by_size(column.size) - 1]
+    elif column.type == FIELD_TYPE.SET:
+        return set_decoder(column)
+    elif column.type == FIELD_TYPE.BIT:
+        return bit_decoder(column, options.get("bit_as_int", False))
+    elif column.type == FIELD_TYPE.GEOMETRY:
+        if options.get("raw_strings", False):
+            return lambda packet: packet.read_length_coded_pascal_view(column.length_size)
+        return lambda packet: packet.read_length_coded_pascal_string(column.length_size)
+    raise NotImplementedError("Unknown MySQL column type: %d" % (column.type))
+
+
+def column_skipper(column):
+    '''Return a function moving a packet after a value of the column,
+    without decoding it'''
+    size = None
+    if column.type in (FIELD_TYPE.TINY, FIELD_TYPE.YEAR):
+        size = 1
+    elif column.type == FIELD_TYPE.SHORT:
+        size = 2
+    elif column.type in (FIELD_TYPE.INT24, FIELD_TYPE.TIME, FIELD_TYPE.DATE):
+        size = 3
+    elif column.type in (FIELD_TYPE.LONG, FIELD_TYPE.FLOAT, FIELD_TYPE.TIMESTAMP):
+        size = 4
+    elif column.type in (FIELD_TYPE.LONGLONG, FIELD_TYPE.DOUBLE, FIELD_TYPE.DATETIME):
+        size = 8
+    elif column.type in (FIELD_TYPE.ENUM, FIELD_TYPE.SET):
+        size = column.size
+    elif column.type == FIELD_TYPE.BIT:
+        size = column.bytes
+    elif column.type == FIELD_TYPE.NEWDECIMAL:
+        size = decimal_size(column.precision, column.decimals)
+    elif column.type == FIELD_TYPE.VARCHAR or column.type == FIELD_TYPE.STRING:
+        length_size = 2 if column.max_length > 255 else 1
+        return lambda packet: packet.advance(packet.read_uint_by_size(length_size))
+    elif column.type in (FIELD_TYPE.BLOB, FIELD_TYPE.GEOMETRY):
+        length_size = column.length_size
+        return lambda packet: packet.advance(packet.read_uint_by_size(length_size))
+    else:
+        raise NotImplementedError("Unknown MySQL column type: %d" % (column.type))
+    return lambda packet: packet.advance(size)
+
+
+def _struct_reader(reader):
+    def decode(packet):
+        return packet.read_struct(reader)[0]
+    return decode
+
+
+def _string_reader(size, column, raw_strings = False):
+    if raw_strings:
+        return lambda packet: packet.read_length_coded_pascal_view(size)
+    charset = column.character_set_name
+    if charset is None:
+        return lambda packet: packet.read_length_coded_pascal_string(size)
+
+    def decode(packet):
+        return packet.read_length_coded_pascal_string(size).decode(charset)
+    return decode
+
+
+# Bits of each byte value, most significant first
+BYTE_BITS = ["{0:08b}".format(value) for value in range(0, 256)]
+
+
+def set_decoder(column):
+    '''Return a function reading a SET. The value is a bitmask of the set
+    items to include (ex. 1101 would mean the first, third, and fourth
+    items), decoded a byte at a time with a table per byte of the mask'''
+    size = column.size
+    tables = []
+    for i in range(0, size):
+        items = column.set_values[i * 8:(i + 1) * 8]
+        table = []
+        for value in range(0, 256):
+            table.append(','.join([items[bit] for bit in range(0, len(items)) if value & (1 << bit)]))
+        tables.append(table)
+
+    def decode(packet):
+        data = bytearray(packet.read(size))
+        return ','.join([tables[i][data[i]] for i in range(0, size) if data[i]])
+    return decode
+
+
+def bit_decoder(column, bit_as_int = False):
+    '''Return a function reading MySQL BIT type, as a string of column.bits
+    digits like '0101' or as an integer'''
+    size = column.bytes
+    bits = column.bits
+    if bit_as_int:
+        padding = '\x00' * (8 - size)
+        mask = (1 << bits) - 1
+
+        def decode(packet):
+            return UINT64_BE.unpack(padding + packet.read(size))[0] & mask
+        return decode
+
+    def decode(packet):
+        return ''.join([BYTE_BITS[byte] for byte in bytearray(packet.read(size))])[-bits:]
+    return decode
+
+
+def temporal_decoder(column, temporal_format = "datetime"):
+    '''Return a function reading a DATETIME, DATE, TIME or TIMESTAMP value.
+
+    temporal_format is one of TEMPORAL_FORMATS. The values in a table
+    often share the same date or second, so the converted values are
+    memoized by packed value.'''
+    if column.type == FIELD_TYPE.DATETIME:
+        read = _struct_reader(UINT64)
+        convert = datetime_epoch if temporal_format == "epoch" else datetime_from_packed
+    elif column.type == FIELD_TYPE.DATE:
+        read = lambda packet: packet.read_uint24()
+        convert = date_epoch if temporal_format == "epoch" else date_from_packed
+    elif column.type == FIELD_TYPE.TIME:
+        read = lambda packet: packet.read_uint24()
+        convert = time_seconds if temporal_format == "epoch" else time_from_packed
+    else:
+        # TIMESTAMP are already stored as epoch seconds
+        read = _struct_reader(UINT32)
+        if temporal_format == "epoch":
+            return read
+        convert = datetime.datetime.fromtimestamp
+
+    if temporal_format == "raw":
+        return read
+    return _memoized_reader(read, convert)
+
+
+def _memoized_reader(read, convert):
+    cache = {}
+
+    def decode(packet):
+        packed = read(packet)
+        try:
+            return cache[packed]
+        except KeyError:
+            # Bounded by dropping everything, the values are cheap to rebuild
+            if len(cache) >= TEMPORAL_CACHE_SIZE:
+                cache.clear()
+            value = cache[packed] = convert(packed)
+            return value
+    return decode
+
+
+def time_from_packed(value):
+    '''TIME stored as the integer hhmmss'''
+    hour, minute_second = divmod(value, 10000)
+    minute, second = divmod(minute_second, 100)
+    return datetime.time(hour = hour, minute = minute, second = second)
+
+
+def time_seconds(value):
+    '''Number of seconds of a packed TIME'''
+    hour, minute_second = divmod(value, 10000)
+    minute, second = divmod(minute_second, 100)
+    return hour * 3600 + minute * 60 + second
+
+
+def _unpack_date(value):
+    # year on 15 bits, month on 4 bits, day on 5 bits
+    return (value >> 9, (value >> 5) & 0x0f, value & 0x1f)
+
+
+def date_from_packed(value):
+    year, month, day = _unpack_date(value)
+
+    # In python, the year can't be zero, so if it is, then we'll just
+    # create a MySQL string ourselves
+    if year == 0:
+        return '{0}-{1}-{2}'.format(year, month, day)
+    return datetime.date(year = year, month = month, day = day)
+
+
+def date_epoch(value):
+    '''Epoch seconds of the midnight UTC of a packed DATE, None for a zero date'''
+    year, month, day = _unpack_date(value)
+    if year == 0:
+        return None
+    return calendar.timegm((year, month, day, 0, 0, 0))
+
+
+def _unpack_datetime(value):
+    # DATETIME is stored as the integer YYYYMMDDhhmmss
+    date, time = divmod(value, 1000000)
+    year, month_day = divmod(date, 10000)
+    month, day = divmod(month_day, 100)
+    hour, minute_second = divmod(time, 10000)
+    minute, second = divmod(minute_second, 100)
+    return (year, month, day, hour, minute, second)
+
+
+def datetime_from_packed(value):
+    year, month, day, hour, minute, second = _unpack_datetime(value)
+
+    # Same problem as with date
+    if year == 0:
+        return '{0}-{1}-{2} {3}:{4}:{5}'.format(year, month, day,
+                hour, minute, second)
+    return datetime.datetime(year = year, month = month, day = day,
+        hour = hour, minute = minute, second = second)
+
+
+def datetime_epoch(value):
+    '''Epoch seconds of a packed DATETIME taken as UTC, None for a zero date'''
+    fields = _unpack_datetime(value)
+    if fields[0] == 0:
+        return None
+    return calendar.timegm(fields)
+
+
+DIG_PER_DEC = 9
+# Bytes used by the leftover digits of a decimal
+COMPRESSED_BYTES = [0, 1, 1, 2, 2, 3, 3, 4, 4, 4]
+# struct formats and masks of the big endian groups by group size,
+# 3 bytes groups are read as a byte and a short
+GROUP_FORMATS = {1: "B", 2: "H", 3: "BH", 4: "I"}
+GROUP_MASKS = {1: (0xff,), 2: (0xffff,), 3: (0xff, 0xffff), 4: (0xffffffff,)}
+
+# Layout of the decimals by (precision, scale)
+_decimal_layouts = {}
+
+
+def decimal_size(precision, scale):
+    '''Bytes used by a DECIMAL(precision, scale) value in a row'''
+    integral = precision - scale
+    return (integral / DIG_PER_DEC + scale / DIG_PER_DEC) * 4 \
+        + COMPRESSED_BYTES[integral % DIG_PER_DEC] + COMPRESSED_BYTES[scale % DIG_PER_DEC]
+
+
+def decimal_layout(precision, scale):
+    '''Return the (struct, masks, groups, sign bit) layout of a decimal.
+
+    A decimal is stored as big endian groups of 9 digits, the leftover
+    digits of the integral and fractional parts use less bytes. groups
+    has for each group if it's read in two parts and 10 ** digits.'''
+    layout = _decimal_layouts.get((precision, scale))
+    if layout is None:
+        integral = precision - scale
+        digits = []
+        if integral % DIG_PER_DEC:
+            digits.append(integral % DIG_PER_DEC)
+        digits += [DIG_PER_DEC] * (integral / DIG_PER_DEC + scale / DIG_PER_DEC)
+        if scale % DIG_PER_DEC:
+            digits.append(scale % DIG_PER_DEC)
+
+        fmt = ">"
+        masks = ()
+        groups = []
+        for count in digits:
+            size = COMPRESSED_BYTES[count]
+            fmt += GROUP_FORMATS[size]
+            masks += GROUP_MASKS[size]
+            groups.append((size == 3, 10 ** count))
+        # The sign is the high bit of the first byte
+        sign_bit = (masks[0] + 1) >> 1
+        layout = (struct.Struct(fmt), masks, tuple(groups), sign_bit)
+        _decimal_layouts[(precision, scale)] = layout
+    return layout
+
+
+def read_decimal_int(packet, layout):
+    '''Read a decimal as an integer scaled by 10 ** scale'''
+    reader, masks, groups, sign_bit = layout
+    values = packet.read_struct(reader)
+    # The bytes of negative values are inverted
+    negative = not values[0] & sign_bit
+    if negative:
+        values = [value ^ mask for value, mask in zip(values, masks)]
+    else:
+        values = list(values)
+    values[0] ^= sign_bit
+
+    result = 0
+    i = 0
+    for split, factor in groups:
+        if split:
+            result = result * factor + (values[i] << 16) + values[i + 1]
+            i += 2
+        else:
+            result = result * factor + values[i]
+            i += 1
+    if negative:
+        return -result
+    return result
+
+
+def decimal_decoder(column, decimal_as_int = False):
+    '''Return a function reading MySQL's new decimal format introduced in
+    MySQL 5. With decimal_as_int the value is an integer, scaled by
+    10 ** column.decimals, else a decimal.Decimal'''
+
+    # This project was a great source of inspiration for
+    # understanding this storage format.
+    # https://github.com/jeremycole/mysql_binlog
+    layout = decimal_layout(column.precision, column.decimals)
+    if decimal_as_int:
+        return lambda packet: read_decimal_int(packet, layout)
+
+    exponent = "E-%d" % (column.decimals) if column.decimals else ""
+
+    def decode(packet):
+        return decimal.Decimal("%d%s" % (read_decimal_int(packet, layout), exponent))
+    return decode
@@ -1,23 +1,29 @@
+import re
 import struct 
 from datetime import datetime
 
 from pymysql.util import byte2int, int2byte
 
+from .constants.BINLOG import BINLOG_CHECKSUM_LEN, BINLOG_CHECKSUM_ALG_DESC_LEN, \
+    BINLOG_CHECKSUM_ALG_CRC32
+
 
 
 class BinLogEvent(object):
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
         self.packet = from_packet
         self.table_map = table_map
         self.event_type = self.packet.event_type
         self.timestamp = self.packet.timestamp
         self.event_size = event_size
         self._ctl_connection = ctl_connection
+        # Position after the event, set by the stream reader
+        self.log_file = None
+        self.log_pos = None
 
     def _read_table_id(self):
         # Table ID is 6 byte
-        table_id = self.packet.read(6) + int2byte(0) + int2byte(0)   # pad little-endian number
-        return struct.unpack('<Q', table_id)[0]
+        return self.packet.read_uint48()
 
     def dump(self):
         print("=== %s ===" % (self.__class__.__name__))
@@ -33,11 +39,95 @@ class BinLogEvent(object):
 
 
 class RotateEvent(BinLogEvent):
-    pass
+    """
+        Change of binlog file, at the end of a file or at the start of
+        the stream
+
+        Attributes:
+            position: Position of the first event in the next file
+            next_binlog: Name of the next binlog file
+    """
+
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(RotateEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
+        self.position = self.packet.read_uint64()
+        self.next_binlog = self.packet.read(event_size - 8)
+
+    def _dump(self):
+        super(RotateEvent, self)._dump()
+        print("Position: %d" % (self.position))
+        print("Next binlog file: %s" % (self.next_binlog))
 
 
 class FormatDescriptionEvent(BinLogEvent):
-    pass
+    """
+        First event of a binlog file, describing the format of the events
+        following it
+
+        Attributes:
+            binlog_version: Version of the binlog format, 4 since MySQL 5.0
+            server_version: Version of the server which wrote the file
+            create_timestamp: Creation time of the file, 0 unless it's the first file
+                written since the server start
+            common_header_len: Size of the header of the events
+            post_header_len: Size of the post header of each event type, by event type - 1
+            checksum_algorithm: BINLOG_CHECKSUM_ALG_OFF or BINLOG_CHECKSUM_ALG_CRC32, None before
+                MySQL 5.6.1 which has no checksums
+    """
+
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(FormatDescriptionEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
+        self.binlog_version = self.packet.read_uint16()
+        self.server_version = self.packet.read(50).rstrip("\0")
+        self.create_timestamp = self.packet.read_uint32()
+        self.common_header_len = self.packet.read_uint8()
+        size = event_size - 57
+        # Since MySQL 5.6.1 the event ends with the checksum algorithm and its own checksum
+        if _server_version(self.server_version) >= (5, 6, 1):
+            self.post_header_len = self.packet.read(size - BINLOG_CHECKSUM_ALG_DESC_LEN - BINLOG_CHECKSUM_LEN)
+            self.checksum_algorithm = self.packet.read_uint8()
+            self.packet.advance(BINLOG_CHECKSUM_LEN)
+        else:
+            self.post_header_len = self.packet.read(size)
+            self.checksum_algorithm = None
+
+    @property
+    def checksum(self):
+        '''True if the events of the file end with a CRC32 checksum'''
+        return self.checksum_algorithm == BINLOG_CHECKSUM_ALG_CRC32
+
+    def _dump(self):
+        super(FormatDescriptionEvent, self)._dump()
+        print("Binlog version: %d" % (self.binlog_version))
+        print("Server version: %s" % (self.server_version))
+        print("Checksum algorithm: %s" % (self.checksum_algorithm))
+
+
+def _server_version(server_version):
+    '''(major, minor, patch) of a version like 5.6.12-log'''
+    match = re.match(r'(\d+)\.(\d+)\.(\d+)', server_version)
+    if match is None:
+        return (0, 0, 0)
+    return tuple(int(part) for part in match.groups())
+
+
+class HeartbeatLogEvent(BinLogEvent):
+    """
+        Sent by the master when it had no event to send during the heartbeat
+        period. It only tells the connection is alive, the readers don't
+        return it
+
+        Attributes:
+            log_ident: Binlog file of the master
+    """
+
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(HeartbeatLogEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
+        self.log_ident = self.packet.read(event_size)
+
+    def _dump(self):
+        super(HeartbeatLogEvent, self)._dump()
+        print("Binlog file: %s" % (self.log_ident))
 
 
 class XidEvent(BinLogEvent):
@@ -48,9 +138,9 @@ class XidEvent(BinLogEvent):
             xid: Transaction ID for 2PC
     """
 
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
-        super(XidEvent, self).__init__(from_packet, event_size, table_map, ctl_connection)
-        self.xid = struct.unpack('<Q', self.packet.read(8))[0]
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(XidEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
+        self.xid = self.packet.read_uint64()
 
     def _dump(self):
         super(XidEvent, self)._dump()
@@ -58,8 +148,8 @@ class XidEvent(BinLogEvent):
 
 
 class QueryEvent(BinLogEvent):
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
-        super(QueryEvent, self).__init__(from_packet, event_size, table_map, ctl_connection)
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(QueryEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
 
         # Post-header
         self.slave_proxy_id = self.packet.read_uint32()
@@ -0,0 +1,88 @@
+from pymysql.util import byte2int
+
+from .packet import BinLogPacketWrapper, HEADER_SIZE, UINT16, UINT32, UINT48
+from .catalog import is_ddl
+from .constants.BINLOG import TABLE_MAP_EVENT, QUERY_EVENT, XID_EVENT
+from .row_event import RowsEvent, TableMapEvent
+from .event import QueryEvent
+
+
+class EventFilter(object):
+    '''Select the events given to the user of a reader with only_events,
+    only_schemas and only_tables. The rows events are selected with the
+    TableMapEvent of their table in table_map.
+
+    The TableMapEvents of the current transaction are pinned in table_map,
+    they can't be evicted before its rows events are read'''
+
+    def __init__(self, table_map, only_events = None, only_schemas = None, only_tables = None):
+        self.table_map = table_map
+        if only_events is not None:
+            only_events = tuple(only_events)
+        self.only_events = only_events
+        self.only_schemas = only_schemas
+        self.only_tables = only_tables
+
+    def add_table_map(self, event):
+        '''Remember a TableMapEvent, wanted or not, for the rows events
+        of its table'''
+        self.table_map.pin(event.table_id)
+        self.table_map[event.table_id] = event
+
+    def filter_header(self, data, offset):
+        '''Decide from the header of the event at offset in data, without
+        parsing the event body, if the event will be filtered'''
+        event_type = byte2int(data[offset + 4])
+        if event_type == XID_EVENT:
+            # End of the transaction
+            self.table_map.unpin_all()
+        # TableMapEvent are always parsed, they are required by the rows events
+        if event_type == TABLE_MAP_EVENT:
+            return False
+        event_class = BinLogPacketWrapper.event_class(event_type)
+        if event_class is None:
+            return True
+        body = offset + HEADER_SIZE
+        if event_type == QUERY_EVENT:
+            schema_length = byte2int(data[body + 8])
+            status_vars_length = UINT16.unpack_from(data, body + 11)[0]
+            schema = body + 13 + status_vars_length
+            query = schema + schema_length + 1
+            # Any query but BEGIN ends the transaction, like a COMMIT or a DDL
+            if data[query:query + 5].upper() != "BEGIN":
+                self.table_map.unpin_all()
+            # DDL are always parsed, they update the schema catalog. The
+            # statement can come after comments, the whole query is checked
+            end = offset + UINT32.unpack_from(data, offset + 9)[0]
+            if is_ddl(data[query:end]):
+                return False
+        if self.only_events is not None and \
+                not issubclass(event_class, self.only_events):
+            return True
+        if issubclass(event_class, RowsEvent):
+            table_id = UINT48.unpack_from(data, body)
+            table_id = table_id[0] + (table_id[1] << 16) + (table_id[2] << 32)
+            # The TableMapEvent comes before, in the same transaction
+            if table_id not in self.table_map:
+                raise ValueError("Rows event of table id %d without its TableMapEvent" % (table_id))
+            return not self.table_map[table_id].wanted
+        elif event_type == QUERY_EVENT and self.only_schemas is not None:
+            return data[schema:schema + schema_length] not in self.only_schemas
+        return False
+
+    def filter_event(self, event):
+        # If it's a RowsEvent, TableMapEvent or QueryEvent, the event database
+        # and table must be allowed
+        if isinstance(event, (RowsEvent, TableMapEvent)) and \
+                not self.table_map[event.table_id].wanted:
+                    return True
+        elif isinstance(event, QueryEvent) and self.only_schemas is not None and \
+                event.schema not in self.only_schemas:
+                    return True
+        elif self.only_events is not None:
+            for allowed_event in self.only_events:
+                if isinstance(event, allowed_event):
+                    return False
+            return True
+
+        return False
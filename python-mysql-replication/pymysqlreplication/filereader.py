@@ -0,0 +1,174 @@
+import os
+import mmap
+
+from pymysql.util import byte2int
+
+from .packet import BinLogPacketWrapper, HEADER, HEADER_SIZE
+from .cache import LRUCache
+from .catalog import SchemaCatalog, apply_ddl
+from .decoder import ROW_FORMATS, TEMPORAL_FORMATS
+from .eventfilter import EventFilter
+from .constants.BINLOG import TABLE_MAP_EVENT, QUERY_EVENT, FORMAT_DESCRIPTION_EVENT
+
+# First bytes of a binlog file
+BINLOG_MAGIC = '\xfebin'
+
+
+class FilePacket(object):
+    '''Event of a binlog file, with the interface of the pymysql packets
+    used by BinLogPacketWrapper. data has one byte before the header,
+    where the packets of the stream have their OK byte'''
+
+    def __init__(self, data):
+        self.__data = data
+
+    def get_all_data(self):
+        return self.__data
+
+    def is_ok_packet(self):
+        return True
+
+
+class BinLogFileReader(object):
+    '''Read the events of binlog files on the disk, without a master.
+
+    The files are memory mapped and read in the given order. The events
+    are cut with the sizes in their headers, and the filtered ones are
+    skipped from their header without being copied. The columns of the
+    tables come from schema_catalog, which must describe the tables as
+    they were when the files were written, a SchemaCatalog or the path
+    of a file saved by BinLogStreamReader with schema_catalog_file. The
+    DDL queries of the files update it like with BinLogStreamReader, but
+    there is no server to fetch the new columns of a changed table from:
+    its next TableMapEvent raises SchemaCatalogError.
+
+        reader = BinLogFileReader(["mysql-bin.000001", "mysql-bin.000002"],
+            schema_catalog = "catalog.json", only_events = [WriteRowsEvent])
+        for event in reader:
+            event.dump()
+    '''
+
+    def __init__(self, files, schema_catalog = None, log_pos = None, only_events = None,
+            only_schemas = None, only_tables = None, table_map_size = 4096, row_format = "dict",
+            decimal_as_int = False, temporal_format = "datetime", bit_as_int = False,
+            raw_strings = False):
+        '''
+        files: Paths of the binlog files, in the binlog order
+        schema_catalog: SchemaCatalog or path of a saved catalog with the columns of the tables, saved
+            at or before the start position
+        log_pos: Position in the first file to start from, between two transactions. The
+            FormatDescriptionEvent of the file is skipped
+        The other options are the ones of BinLogStreamReader
+        '''
+        if isinstance(files, basestring):
+            files = [files]
+        self.__files = list(files)
+        if schema_catalog is None:
+            schema_catalog = SchemaCatalog()
+        elif isinstance(schema_catalog, basestring):
+            schema_catalog = SchemaCatalog.from_file(schema_catalog)
+        self.schema_catalog = schema_catalog
+        # Reading starts there in the first file
+        self.__start_pos = log_pos if log_pos is not None else 0
+        if row_format not in ROW_FORMATS:
+            raise ValueError("Unknown row format: %s" % (row_format))
+        self.__row_format = row_format
+        if temporal_format not in TEMPORAL_FORMATS:
+            raise ValueError("Unknown temporal format: %s" % (temporal_format))
+        self.__decoder_options = {"decimal_as_int": decimal_as_int, "temporal_format": temporal_format,
+            "bit_as_int": bit_as_int, "raw_strings": raw_strings}
+
+        self.table_map = LRUCache(table_map_size)
+        self.__layout_cache = LRUCache(table_map_size)
+        self.__event_filter = EventFilter(self.table_map, only_events, only_schemas, only_tables)
+
+        # File being read
+        self.__file = None
+        self.__map = None
+        self.__offset = 0
+        self.__checksum = False
+        self.log_file = None
+        self.log_pos = None
+
+    def close(self):
+        if self.__map is not None:
+            self.__close_file()
+        self.__files = []
+
+    def fetchone(self):
+        while True:
+            if self.__map is None:
+                if len(self.__files) == 0:
+                    return None
+                self.__open(self.__files.pop(0))
+                continue
+            offset = self.__offset
+            # A file still written can end with a partial event
+            if offset + HEADER_SIZE > len(self.__map):
+                self.__close_file()
+                continue
+            event_size = HEADER.unpack_from(self.__map, offset)[3]
+            end = offset + event_size
+            if end > len(self.__map):
+                self.__close_file()
+                continue
+            self.__offset = end
+            self.log_pos = end
+            if self.__event_filter.filter_header(self.__map, offset):
+                continue
+            binlog_event = self.__wrap(offset, end)
+            if binlog_event.event_type == TABLE_MAP_EVENT:
+                self.__event_filter.add_table_map(binlog_event.event)
+            elif binlog_event.event_type == QUERY_EVENT:
+                apply_ddl(self.schema_catalog, self.table_map, self.__layout_cache, binlog_event.event)
+            if self.__event_filter.filter_event(binlog_event.event):
+                continue
+            return binlog_event.event
+
+    def __open(self, path):
+        self.__file = open(path, "rb")
+        if os.fstat(self.__file.fileno()).st_size == 0:
+            self.__file.close()
+            self.__file = None
+            return
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access = mmap.ACCESS_READ)
+        if self.__map[:len(BINLOG_MAGIC)] != BINLOG_MAGIC:
+            self.__close_file()
+            raise ValueError("%s is not a binlog file" % (path))
+        self.log_file = os.path.basename(path)
+        self.__offset = len(BINLOG_MAGIC)
+        self.__checksum = False
+        # The FormatDescriptionEvent tells if the events have a checksum,
+        # it's read again by fetchone
+        if self.__offset + HEADER_SIZE <= len(self.__map):
+            header = HEADER.unpack_from(self.__map, self.__offset)
+            if header[1] == FORMAT_DESCRIPTION_EVENT:
+                end = self.__offset + header[3]
+                self.__checksum = self.__wrap(self.__offset, end).event.checksum
+        if self.__start_pos is not None:
+            self.__offset = max(self.__offset, self.__start_pos)
+            self.__start_pos = None
+            self.schema_catalog.check_position(self.log_file, self.__offset)
+
+    def __close_file(self):
+        self.__map.close()
+        self.__file.close()
+        self.__map = None
+        self.__file = None
+
+    def __wrap(self, offset, end):
+        # The FormatDescriptionEvent reads its checksum itself
+        checksum = self.__checksum and byte2int(self.__map[offset + 4]) != FORMAT_DESCRIPTION_EVENT
+        # The byte before the header takes the place of the OK byte
+        binlog_event = BinLogPacketWrapper(FilePacket(self.__map[offset - 1:end]), self.table_map, None,
+                only_schemas = self.__event_filter.only_schemas,
+                only_tables = self.__event_filter.only_tables,
+                schema_catalog = self.schema_catalog, layout_cache = self.__layout_cache,
+                row_format = self.__row_format, decoder_options = self.__decoder_options,
+                checksum = checksum)
+        binlog_event.event.log_file = self.log_file
+        binlog_event.event.log_pos = end
+        return binlog_event
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
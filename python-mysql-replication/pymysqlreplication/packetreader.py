@@ -0,0 +1,209 @@
+import struct
+
+#Constants from PyMYSQL source code
+NULL_COLUMN = 251
+UNSIGNED_CHAR_COLUMN = 251
+UNSIGNED_SHORT_COLUMN = 252
+UNSIGNED_INT24_COLUMN = 253
+UNSIGNED_INT64_COLUMN = 254
+UNSIGNED_CHAR_LENGTH = 1
+UNSIGNED_SHORT_LENGTH = 2
+UNSIGNED_INT24_LENGTH = 3
+UNSIGNED_INT64_LENGTH = 8
+
+# Common header of all the binlog events
+HEADER = struct.Struct('<IBIIIH')
+HEADER_SIZE = HEADER.size
+
+UINT8 = struct.Struct('<B')
+UINT16 = struct.Struct('<H')
+UINT24 = struct.Struct('<HB')
+INT24 = struct.Struct('<Hb')
+UINT32 = struct.Struct('<I')
+UINT40 = struct.Struct('<BI')
+UINT48 = struct.Struct('<HHH')
+UINT56 = struct.Struct('<BHI')
+UINT64 = struct.Struct('<Q')
+INT64 = struct.Struct('<q')
+BE_INT8 = struct.Struct('>b')
+BE_INT16 = struct.Struct('>h')
+BE_INT24 = struct.Struct('>bH')
+BE_INT32 = struct.Struct('>i')
+BE_INT64 = struct.Struct('>q')
+
+
+class PacketReader(object):
+    """
+    Read values from a binary buffer. The buffer is never sliced or
+    concatenated, a cursor moves over it instead. Fixed size values are
+    unpacked in place and sub-slices can be served as memoryview
+    windows on the buffer.
+    """
+
+    def __init__(self, data, offset = 0):
+        self._data = data
+        self._view = memoryview(data)
+        self._offset = offset
+        self._start = offset
+
+    @property
+    def read_bytes(self):
+        '''Number of bytes consumed since the start of the reader'''
+        return self._offset - self._start
+
+    def read(self, size):
+        size = int(size)
+        offset = self._offset
+        self._offset = offset + size
+        return self._data[offset:offset + size]
+
+    def read_view(self, size):
+        '''Same as read but return a zero-copy memoryview window'''
+        size = int(size)
+        offset = self._offset
+        self._offset = offset + size
+        return self._view[offset:offset + size]
+
+    def read_buffer(self, size):
+        '''Return the buffer and the offset of the next size bytes, for the
+        functions working on a buffer and an offset like numpy.frombuffer'''
+        offset = self._offset
+        self._offset = offset + int(size)
+        return (self._data, offset)
+
+    @property
+    def buffer(self):
+        '''The whole buffer read'''
+        return self._data
+
+    def tell(self):
+        '''Offset of the cursor in the buffer'''
+        return self._offset
+
+    def peek(self, size):
+        '''Return the next bytes without moving the cursor'''
+        return self._data[self._offset:self._offset + int(size)]
+
+    def peek_uint8(self):
+        return UINT8.unpack_from(self._data, self._offset)[0]
+
+    def advance(self, size):
+        self._offset += int(size)
+
+    def read_struct(self, reader):
+        '''Unpack a precompiled struct.Struct at the cursor'''
+        values = reader.unpack_from(self._data, self._offset)
+        self._offset += reader.size
+        return values
+
+    def read_length_coded_binary(self):
+        """Read a 'Length Coded Binary' number from the data buffer.
+
+        Length coded numbers can be anywhere from 1 to 9 bytes depending
+        on the value of the first byte.
+
+        From PyMYSQL source code
+        """
+        c = self.read_uint8()
+        if c == NULL_COLUMN:
+          return None
+        if c < UNSIGNED_CHAR_COLUMN:
+          return c
+        elif c == UNSIGNED_SHORT_COLUMN:
+            return self.read_uint16()
+        elif c == UNSIGNED_INT24_COLUMN:
+          return self.read_uint24()
+        elif c == UNSIGNED_INT64_COLUMN:
+          return self.read_uint64()
+
+    def read_length_coded_string(self):
+        """Read a 'Length Coded String' from the data buffer.
+
+        A 'Length Coded String' consists first of a length coded
+        (unsigned, positive) integer represented in 1-9 bytes followed by
+        that many bytes of binary data.  (For example "cat" would be "3cat".)
+
+        From PyMYSQL source code
+        """
+        length = self.read_length_coded_binary()
+        if length is None:
+            return None
+        return self.read(length).decode()
+
+    def read_int_be_by_size(self, size):
+        '''Read a big endian integer values based on byte number'''
+        if size == 1:
+            return self.read_struct(BE_INT8)[0]
+        elif size == 2:
+            return self.read_struct(BE_INT16)[0]
+        elif size == 3:
+            a, b = self.read_struct(BE_INT24)
+            return (a << 16) + b
+        elif size == 4:
+            return self.read_struct(BE_INT32)[0]
+        elif size == 8:
+            return self.read_struct(BE_INT64)[0]
+
+    def read_uint_by_size(self, size):
+        '''Read a little endian integer values based on byte number'''
+        if size == 1:
+            return self.read_uint8()
+        elif size == 2:
+            return self.read_uint16()
+        elif size == 3:
+            return self.read_uint24()
+        elif size == 4:
+            return self.read_uint32()
+        elif size == 5:
+            return self.read_uint40()
+        elif size == 6:
+            return self.read_uint48()
+        elif size == 7:
+            return self.read_uint56()
+        elif size == 8:
+            return self.read_uint64()
+
+    def read_length_coded_pascal_string(self, size):
+        '''Read a string with length coded using pascal style. The string start by the size of the string'''
+        length = self.read_uint_by_size(size)
+        return self.read(length)
+
+    def read_length_coded_pascal_view(self, size):
+        '''Same as read_length_coded_pascal_string but return a zero-copy memoryview'''
+        length = self.read_uint_by_size(size)
+        return self.read_view(length)
+
+    def read_int24(self):
+        a, b = self.read_struct(INT24)
+        return a + (b << 16)
+
+    def read_uint8(self):
+        return self.read_struct(UINT8)[0]
+
+    def read_uint16(self):
+        return self.read_struct(UINT16)[0]
+
+    def read_uint24(self):
+        a, b = self.read_struct(UINT24)
+        return a + (b << 16)
+
+    def read_uint32(self):
+        return self.read_struct(UINT32)[0]
+
+    def read_uint40(self):
+        a, b = self.read_struct(UINT40)
+        return a + (b << 8)
+
+    def read_uint48(self):
+        a, b, c = self.read_struct(UINT48)
+        return a + (b << 16) + (c << 32)
+
+    def read_uint56(self):
+        a, b, c = self.read_struct(UINT56)
+        return a + (b << 8) + (c << 24)
+
+    def read_uint64(self):
+        return self.read_struct(UINT64)[0]
+
+    def read_int64(self):
+        return self.read_struct(INT64)[0]
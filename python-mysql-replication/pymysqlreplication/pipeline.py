@@ -0,0 +1,43 @@
+import os
+
+from .cache import LRUCache
+from .decoder import RowDecoder
+from .packetreader import PacketReader
+
+# Decoders of the worker process by id of the decoder of the reader
+_decoders = LRUCache(1024)
+
+
+def decode_rows(task):
+    '''Decode the rows of a rows event in a worker process.
+
+    task is returned by RowsEvent._decode_task. Return the pid of the
+    process, the ids of the decoders it keeps and the row images in order,
+    dict for the dict row format else tuples. The ids are only returned
+    when the task has columns or misses its decoder, else they are None.
+    The images are None if the task has no columns and the process doesn't
+    have its decoder, it must be sent again with the columns.'''
+    decoder_id, columns, options, row_format, bitmaps, payload = task
+    decoder = _decoders.get(decoder_id)
+    if decoder is None:
+        if columns is None:
+            return os.getpid(), _decoders.keys(), None
+        decoder = RowDecoder(columns, **options)
+        _decoders[decoder_id] = decoder
+    decoder_ids = None
+    if columns is not None:
+        decoder_ids = _decoders.keys()
+    if row_format != "dict":
+        # namedtuple classes are created at runtime and can't be pickled
+        row_format = "tuple"
+    readers = []
+    for bitmap in bitmaps:
+        image_decoder = decoder.subset(bitmap)
+        readers.append(((len(image_decoder.columns) + 7) / 8, image_decoder.reader(row_format)))
+
+    images = []
+    packet = PacketReader(payload)
+    while packet.read_bytes < len(payload):
+        for null_bitmap_size, read in readers:
+            images.append(read(packet, packet.read(null_bitmap_size)))
+    return os.getpid(), decoder_ids, images
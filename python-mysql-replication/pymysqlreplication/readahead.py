@@ -0,0 +1,80 @@
+import threading
+import Queue
+
+# Waits on the queue use a timeout, else they can't be interrupted
+# by a KeyboardInterrupt with python 2
+WAIT_TIMEOUT = 60 * 60 * 24
+
+
+class PacketReadAhead(object):
+    '''Read the packets of a connection in a thread, ahead of their
+    decoding, so network latency and decoding overlap.
+
+    At most max_packets packets and max_bytes bytes wait in the queue,
+    the thread stops reading when a limit is reached. The thread stops
+    after the first packet which is not an OK packet or on the first
+    error, which is raised by read_packet.'''
+
+    def __init__(self, connection, max_packets = 1024, max_bytes = 64 * 1024 * 1024):
+        self.__connection = connection
+        self.__queue = Queue.Queue(max_packets)
+        self.__max_bytes = max_bytes
+        self.__queued_bytes = 0
+        self.__bytes_condition = threading.Condition()
+        self.__stopped = False
+        # Last item read, once the thread is finished
+        self.__end = None
+        self.__thread = threading.Thread(target = self.__run, name = "binlog-read-ahead")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __run(self):
+        while not self.__stopped:
+            try:
+                pkt = self.__connection.read_packet()
+            except Exception as e:
+                self.__queue.put((None, e))
+                return
+            size = len(pkt.get_all_data())
+            with self.__bytes_condition:
+                # A packet bigger than max_bytes is queued alone
+                while self.__queued_bytes > 0 and self.__queued_bytes + size > self.__max_bytes \
+                        and not self.__stopped:
+                    self.__bytes_condition.wait(WAIT_TIMEOUT)
+                self.__queued_bytes += size
+            self.__queue.put((pkt, None))
+            if not pkt.is_ok_packet():
+                return
+
+    def read_packet(self):
+        '''Return the next packet of the connection'''
+        if self.__end is None:
+            pkt, error = self.__queue.get(True, WAIT_TIMEOUT)
+            if error is not None or not pkt.is_ok_packet():
+                self.__end = (pkt, error)
+            if pkt is not None:
+                with self.__bytes_condition:
+                    self.__queued_bytes -= len(pkt.get_all_data())
+                    self.__bytes_condition.notify()
+        else:
+            pkt, error = self.__end
+        if error is not None:
+            raise error
+        return pkt
+
+    def pending(self):
+        '''True if read_packet can return without waiting for the network'''
+        return self.__end is not None or not self.__queue.empty()
+
+    def stop(self):
+        '''Stop the thread. It can be blocked reading the connection
+        until the connection is closed'''
+        self.__stopped = True
+        with self.__bytes_condition:
+            self.__bytes_condition.notify()
+        # Unblock the thread if it's waiting for room in the queue
+        while True:
+            try:
+                self.__queue.get_nowait()
+            except Queue.Empty:
+                break
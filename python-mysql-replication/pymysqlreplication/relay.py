@@ -0,0 +1,384 @@
+import os
+import re
+import socket
+import threading
+
+import pymysql
+from pymysql.util import byte2int
+
+from .packet import HEADER, HEADER_SIZE, UINT32, UINT64
+from .filereader import BINLOG_MAGIC, FilePacket
+from .catalog import compare_positions
+from .readahead import WAIT_TIMEOUT
+from .constants.BINLOG import ROTATE_EVENT, FORMAT_DESCRIPTION_EVENT, QUERY_EVENT, \
+    HEARTBEAT_LOG_EVENT
+
+# Seconds RelayLogWriter.stop waits for the thread
+STOP_TIMEOUT = 5
+
+
+def _event_position(data, offset, position):
+    '''Position of the master after the event at offset in data, the
+    events sent at the start of the stream have no position'''
+    event_type = byte2int(data[offset + 4])
+    body = offset + HEADER_SIZE
+    if event_type == HEARTBEAT_LOG_EVENT:
+        return position
+    if event_type == ROTATE_EVENT:
+        event_size = UINT32.unpack_from(data, offset + 9)[0]
+        return (data[body + 8:offset + event_size], UINT64.unpack_from(data, body)[0])
+    log_pos = UINT32.unpack_from(data, offset + 13)[0]
+    if log_pos == 0:
+        return position
+    return (position[0], log_pos)
+
+
+class RelayLog(object):
+    '''Local copy of the binlog stream, in segment files named like
+    relay-bin.000001 in a directory.
+
+    The segments have the format of binlog files. Each one starts with
+    the FormatDescriptionEvent of the master and a RotateEvent with the
+    master position of the events following it, which is how
+    RelayLogReader follows the position of the master in the segments.
+    They are not meant for BinLogFileReader, which would give positions
+    in the segments instead. A new segment is started at the first query
+    once the current one is bigger than segment_size.
+
+    The segments are written by one thread and read by others, with
+    purge removing the ones read and applied.'''
+
+    def __init__(self, directory, segment_size = 256 * 1024 * 1024, prefix = "relay-bin"):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.__prefix = prefix
+        self.__name_re = re.compile(r'^%s\.(\d+)$' % (re.escape(prefix)))
+        self.__condition = threading.Condition()
+        self.__segment = None
+        self.__segment_path = None
+        # Bytes written in the segment, read by the other threads
+        self.__segment_size = 0
+        self.__format_description = None
+        # Master position after the last event written
+        self.log_file = None
+        self.log_pos = None
+        self.__finished = False
+        self.__error = None
+        self.__recover()
+
+    def segments(self):
+        '''Paths of the segments, from the oldest'''
+        numbers = []
+        for name in os.listdir(self.directory):
+            match = self.__name_re.match(name)
+            if match is not None:
+                numbers.append(int(match.group(1)))
+        return [self.__segment_name(number) for number in sorted(numbers)]
+
+    def __segment_name(self, number):
+        return os.path.join(self.directory, "%s.%06d" % (self.__prefix, number))
+
+    def __recover(self):
+        '''Find the master position at the end of the last segment and
+        cut its last event if it was partially written'''
+        segments = self.segments()
+        if len(segments) == 0:
+            return
+        path = segments[-1]
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(BINLOG_MAGIC)] != BINLOG_MAGIC:
+            raise ValueError("%s is not a relay log segment" % (path))
+        position = (None, None)
+        offset = len(BINLOG_MAGIC)
+        while offset + HEADER_SIZE <= len(data):
+            event_size = HEADER.unpack_from(data, offset)[3]
+            if offset + event_size > len(data):
+                break
+            if byte2int(data[offset + 4]) == FORMAT_DESCRIPTION_EVENT and self.__format_description is None:
+                self.__format_description = data[offset:offset + event_size]
+            position = _event_position(data, offset, position)
+            offset += event_size
+        if offset < len(data):
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+        self.log_file, self.log_pos = position
+        self.__segment = open(path, "ab")
+        self.__segment_path = path
+        self.__segment_size = offset
+
+    def write(self, data):
+        '''Append an event of the stream, without the OK byte of its packet'''
+        if byte2int(data[4]) == HEARTBEAT_LOG_EVENT:
+            return
+        if byte2int(data[4]) == FORMAT_DESCRIPTION_EVENT:
+            self.__format_description = data
+        log_pos = UINT32.unpack_from(data, 13)[0]
+        position = _event_position(data, 0, (self.log_file, self.log_pos))
+        # The events sent at the start of the stream, without position, are
+        # not copied, each segment starts with its own
+        if log_pos != 0:
+            # A segment ends before a query, like BEGIN, to keep the
+            # transactions of row events in one segment
+            if self.__segment is None or (self.__segment_size >= self.segment_size and
+                    byte2int(data[4]) == QUERY_EVENT):
+                self.__new_segment()
+            self.__segment.write(data)
+            self.__segment.flush()
+        with self.__condition:
+            if log_pos != 0:
+                self.__segment_size += len(data)
+            self.log_file, self.log_pos = position
+            self.__condition.notify_all()
+
+    def __new_segment(self):
+        segments = self.segments()
+        number = 1
+        if len(segments) > 0:
+            number = int(self.__name_re.match(os.path.basename(segments[-1])).group(1)) + 1
+        if self.__segment is not None:
+            self.__close_segment()
+        path = self.__segment_name(number)
+        segment = open(path, "wb")
+        head = BINLOG_MAGIC
+        if self.__format_description is not None:
+            # Without position, like the one sent at the start of the stream
+            head += self.__format_description[:13] + UINT32.pack(0) + self.__format_description[17:]
+        # Master position of the events following
+        body = UINT64.pack(self.log_pos) + self.log_file
+        head += HEADER.pack(0, ROTATE_EVENT, 0, HEADER_SIZE + len(body), 0, 0) + body
+        segment.write(head)
+        segment.flush()
+        with self.__condition:
+            self.__segment = segment
+            self.__segment_path = path
+            self.__segment_size = len(head)
+
+    def __close_segment(self):
+        self.__segment.flush()
+        os.fsync(self.__segment.fileno())
+        self.__segment.close()
+        self.__segment = None
+
+    def start_position(self, path):
+        '''Master position of the first event of a segment'''
+        with open(path, "rb") as f:
+            data = f.read(4096)
+        offset = len(BINLOG_MAGIC)
+        position = (None, None)
+        while offset + HEADER_SIZE <= len(data):
+            event_type = byte2int(data[offset + 4])
+            position = _event_position(data, offset, position)
+            if event_type == ROTATE_EVENT:
+                return position
+            offset += HEADER.unpack_from(data, offset)[3]
+        return position
+
+    def purge(self, log_file, log_pos):
+        '''Remove the segments with only events before the master position,
+        like the position of the last applied transaction'''
+        segments = self.segments()
+        for path, next_path in zip(segments, segments[1:]):
+            if compare_positions(self.start_position(next_path), (log_file, log_pos)) > 0:
+                break
+            os.remove(path)
+
+    def finish(self, error = None):
+        '''Tell the readers nothing more will be written, because of the end
+        of a non blocking stream or of an error'''
+        with self.__condition:
+            self.__finished = True
+            self.__error = error
+            self.__condition.notify_all()
+
+    def wait(self, path, size):
+        '''Wait until the segment at path is bigger than size or isn't the
+        last one. Return False if nothing more will be written'''
+        with self.__condition:
+            while self.__segment_path == path and self.__segment_size <= size:
+                if self.__finished:
+                    if self.__error is not None:
+                        raise self.__error
+                    return False
+                self.__condition.wait(WAIT_TIMEOUT)
+        return True
+
+    def close(self):
+        if self.__segment is not None:
+            self.__close_segment()
+
+
+class RelayLogWriter(object):
+    '''Copy the binlog stream to a RelayLog in a thread, at the speed
+    of the network. open_dump(log_file, log_pos) opens a connection
+    streaming the binlog, the relay log resumes from its own position
+    when it has one and from log_file and log_pos else'''
+
+    def __init__(self, relay_log, open_dump, log_file = None, log_pos = None):
+        self.__relay_log = relay_log
+        self.__open_dump = open_dump
+        if relay_log.log_file is not None:
+            log_file, log_pos = relay_log.log_file, relay_log.log_pos
+        self.__log_file = log_file
+        self.__log_pos = log_pos
+        self.__connection = None
+        self.__stopped = False
+        self.__exited = False
+        # Set by stop when the thread must close the relay log as it exits
+        self.__close_relay_log = False
+        # Guards the attributes above between the thread and stop
+        self.__lock = threading.Lock()
+        self.__thread = threading.Thread(target = self.__run, name = "binlog-relay")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __run(self):
+        try:
+            while not self.__stopped:
+                if self.__connection is None:
+                    connection = self.__open_dump(self.__log_file, self.__log_pos)
+                    with self.__lock:
+                        self.__connection = connection
+                        if self.__stopped:
+                            break
+                try:
+                    pkt = self.__connection.read_packet()
+                except (pymysql.OperationalError, socket.timeout) as e:
+                    # 2013: Connection Lost. A timeout means no heartbeat came
+                    lost = isinstance(e, socket.timeout) or e.args[0] == 2013
+                    if lost and not self.__stopped:
+                        self.__reconnect()
+                        continue
+                    raise
+                if not pkt.is_ok_packet():
+                    # End of a non blocking stream
+                    self.__relay_log.finish()
+                    return
+                self.__relay_log.write(pkt.get_all_data()[1:])
+        except Exception as e:
+            self.__relay_log.finish(None if self.__stopped else e)
+        finally:
+            self.__close()
+            with self.__lock:
+                self.__exited = True
+                close_relay_log = self.__close_relay_log
+            if close_relay_log:
+                self.__relay_log.close()
+
+    def __close(self):
+        with self.__lock:
+            connection = self.__connection
+            self.__connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except socket.error:
+                pass
+
+    def __reconnect(self):
+        self.__close()
+        if self.__relay_log.log_file is not None:
+            self.__log_file = self.__relay_log.log_file
+            self.__log_pos = self.__relay_log.log_pos
+
+    def stop(self):
+        '''Stop the thread, then close the relay log. If the thread is
+        still writing after STOP_TIMEOUT, it closes the relay log itself
+        when it exits'''
+        with self.__lock:
+            self.__stopped = True
+            connection = self.__connection
+        if connection is not None:
+            # close() doesn't wake up a thread blocked in recv, shutdown does
+            try:
+                connection.socket.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        self.__thread.join(STOP_TIMEOUT)
+        with self.__lock:
+            if not self.__exited:
+                self.__close_relay_log = True
+                return
+        self.__relay_log.close()
+
+
+class RelayLogReader(object):
+    '''Read the events of a RelayLog as packets, following the segments
+    while they are written. Reading starts after the master position
+    (log_file, log_pos), or at the oldest segment'''
+
+    def __init__(self, relay_log, log_file = None, log_pos = None):
+        self.__relay_log = relay_log
+        self.__file = None
+        self.__path = None
+        self.__offset = 0
+        segments = relay_log.segments()
+        if log_file is None:
+            if len(segments) > 0:
+                self.__open(segments[0], len(BINLOG_MAGIC))
+            return
+        target = (log_file, log_pos)
+        for path in reversed(segments):
+            if compare_positions(relay_log.start_position(path), target) <= 0:
+                self.__open(path, self.__find(path, target))
+                return
+        if len(segments) > 0:
+            raise ValueError("The relay log has no events before %s:%d, they are purged" % target)
+
+    def __find(self, path, target):
+        '''Offset in the segment after the event at the master position target'''
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = len(BINLOG_MAGIC)
+        position = (None, None)
+        while offset + HEADER_SIZE <= len(data):
+            event_size = HEADER.unpack_from(data, offset)[3]
+            if offset + event_size > len(data):
+                break
+            position = _event_position(data, offset, position)
+            offset += event_size
+            if compare_positions(position, target) >= 0:
+                break
+        return offset
+
+    def __open(self, path, offset):
+        if self.__file is not None:
+            self.__file.close()
+        self.__file = open(path, "rb")
+        self.__file.seek(offset)
+        self.__path = path
+        self.__offset = offset
+
+    def read_packet(self):
+        '''Return the next event, with an OK byte like the packets of the
+        stream. Return None at the end of a non blocking stream'''
+        while True:
+            if self.__file is None:
+                segments = self.__relay_log.segments()
+                if len(segments) == 0:
+                    if not self.__relay_log.wait(None, 0):
+                        return None
+                    continue
+                self.__open(segments[0], len(BINLOG_MAGIC))
+            header = self.__file.read(HEADER_SIZE)
+            if len(header) == HEADER_SIZE:
+                event_size = HEADER.unpack(header)[3]
+                body = self.__file.read(event_size - HEADER_SIZE)
+                if len(body) == event_size - HEADER_SIZE:
+                    self.__offset += event_size
+                    return FilePacket('\x00' + header + body)
+            # The event isn't completely written yet
+            self.__file.seek(self.__offset)
+            if not self.__relay_log.wait(self.__path, self.__offset):
+                return None
+            segments = self.__relay_log.segments()
+            if self.__path in segments and segments[-1] != self.__path and \
+                    os.path.getsize(self.__path) <= self.__offset:
+                self.__open(segments[segments.index(self.__path) + 1], len(BINLOG_MAGIC))
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
@@ -2,16 +2,40 @@ import struct
 import decimal
 import datetime
 import csv
+import array
+import itertools
 
 from .event import BinLogEvent
 from pymysql.util import byte2int, int2byte
 from pymysql.constants import FIELD_TYPE
 from .column import Column
+from .catalog import columns_match, SchemaCatalogError
+from .decoder import RowDecoder, ColumnBatch, NUMPY_DTYPES, MAPPING_FORMATS, numpy
 
 class RowsEvent(BinLogEvent):
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
-        super(RowsEvent, self).__init__(from_packet, event_size, table_map, ctl_connection)
+    '''Base class of the WRITE, UPDATE and DELETE events.
+
+    The layout of the rows depend of the row_format option:
+    dict (default): a dict per row image, keyed by column name
+    tuple: a tuple per row image, in the order of columns_present
+    record: a namedtuple per row image
+    lazy: a LazyRow per row image, used like a dict but the values
+    are decoded when they are accessed
+
+    An image only has the columns logged by the master, listed in
+    columns_present (and columns_present2 for the after image of
+    updates). All the columns are logged with binlog_row_image=FULL.
+
+    With dict and lazy rows each row is {"values": ...} or
+    {"before_values": ..., "after_values": ...}. With the compact formats
+    a row is the image itself, or a (before, after) pair for updates.'''
+
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(RowsEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
         self.__rows = None
+        self.__rows_start = None
+        self.row_format = kwargs.get("row_format", "dict")
+        self._mapping_rows = self.row_format in MAPPING_FORMATS
 
         #Header
         self.table_id = self._read_table_id()
@@ -19,227 +43,47 @@ class RowsEvent(BinLogEvent):
 
         #Body
         self.number_of_columns = self.packet.read_length_coded_binary()
-        self.columns = self.table_map[self.table_id].columns
+        table = self.table_map[self.table_id]
+        self.columns = table.columns
+        self.decoder = table.decoder
+        self.column_names = self.decoder.names
 
         #Aditionnal informations
-        self.schema = self.table_map[self.table_id].schema
-        self.table = self.table_map[self.table_id].table
-
-    def __is_null(self, null_bitmap, position):
-        bit = null_bitmap[int(position / 8)]
-        if type(bit) is str:
-            bit = ord(bit)
-        return bit & (1 << (position % 8))
-
-    def _read_column_data(self, null_bitmap):
+        self.schema = table.schema
+        self.table = table.table
+
+    def _read_columns_present_bitmaps(self):
+        '''Read the bitmap of the columns logged in each row image. With
+        binlog_row_image=MINIMAL or NOBLOB an image can log only some
+        of the columns, the decoder of each image only reads those.'''
+        bitmaps = []
+        self._image_decoders = []
+        self.__row_readers = []
+        for i in range(0, self._images):
+            bitmap = self.packet.read((self.number_of_columns + 7) / 8)
+            decoder = self.decoder.subset(bitmap)
+            bitmaps.append(bitmap)
+            self._image_decoders.append(decoder)
+            self.__row_readers.append(decoder.reader(self.row_format))
+        return bitmaps
+
+    def _read_column_data(self, null_bitmap, image = 0):
         '''Use for WRITE, UPDATE and DELETE events. Return an array of column data'''
-        values = {}
-
-        nb_columns = len(self.columns)
-        for i in range(0, nb_columns):
-            column = self.columns[i]
-            name = self.table_map[self.table_id].columns[i].name
-            unsigned = self.table_map[self.table_id].columns[i].unsigned
-            if self.__is_null(null_bitmap, i):
-                values[name] = None
-            elif column.type == FIELD_TYPE.TINY:
-                if unsigned:
-                    values[name] = struct.unpack("<B", self.packet.read(1))[0]
-                else:
-                    values[name] = struct.unpack("<b", self.packet.read(1))[0]
-            elif column.type == FIELD_TYPE.SHORT:
-                if unsigned:
-                    values[name] = struct.unpack("<H", self.packet.read(2))[0]
-                else:
-                    values[name] = struct.unpack("<h", self.packet.read(2))[0]
-            elif column.type == FIELD_TYPE.LONG:
-                if unsigned:
-                    values[name] = struct.unpack("<I", self.packet.read(4))[0]
-                else:
-                    values[name] = struct.unpack("<i", self.packet.read(4))[0]
-            elif column.type == FIELD_TYPE.INT24:
-                if unsigned:
-                    values[name] = self.packet.read_uint24()
-                else:
-                    values[name] = self.packet.read_int24()
-            elif column.type == FIELD_TYPE.FLOAT:
-                values[name] = struct.unpack("<f", self.packet.read(4))[0]
-            elif column.type == FIELD_TYPE.DOUBLE:
-                values[name] = struct.unpack("<d", self.packet.read(8))[0]
-            elif column.type == FIELD_TYPE.VARCHAR or column.type == FIELD_TYPE.STRING:
-                if column.max_length > 255:
-                    values[name] = self.__read_string(2, column)
-                else:
-                    values[name] = self.__read_string(1, column)
-            elif column.type == FIELD_TYPE.NEWDECIMAL:
-                values[name] = self.__read_new_decimal(column)
-            elif column.type == FIELD_TYPE.BLOB:
-                values[name] = self.__read_string(column.length_size, column)
-            elif column.type == FIELD_TYPE.DATETIME:
-                values[name] = self.__read_datetime()
-            elif column.type == FIELD_TYPE.TIME:
-                values[name] = self.__read_time()
-            elif column.type == FIELD_TYPE.DATE:
-                values[name] = self.__read_date()
-            elif column.type == FIELD_TYPE.TIMESTAMP:
-                values[name] = datetime.datetime.fromtimestamp(self.packet.read_uint32())
-            elif column.type == FIELD_TYPE.LONGLONG:
-                if unsigned:
-                    values[name] = self.packet.read_uint64()
-                else:
-                    values[name] = self.packet.read_int64()
-            elif column.type == FIELD_TYPE.YEAR:
-                values[name] = self.packet.read_uint8() + 1900
-            elif column.type == FIELD_TYPE.ENUM:
-                values[name] = column.enum_values[self.packet.read_uint_by_size(column.size) - 1]
-            elif column.type == FIELD_TYPE.SET:
-                # reads a bitmask of the set items to include (ex. 1101 would
-                # mean the first, third, and fourth items)
-                bytes = self.packet.read_uint_by_size(column.size)
-                bits = [1 if digit=='1' else 0 for digit in bin(bytes)[2:]]
-                bits.reverse()
-                values[name] = ','.join([column.set_values[i] for i,b in enumerate(bits) if b==1])
-            elif column.type == FIELD_TYPE.BIT:
-                values[name] = self.__read_bit(column)
-            elif column.type == FIELD_TYPE.GEOMETRY:
-                values[name] = self.packet.read_length_coded_pascal_string(column.length_size)
-            else:
-                raise NotImplementedError("Unknown MySQL column type: %d" % (column.type))
-        return values
-
-    def __read_string(self, size, column):
-        str = self.packet.read_length_coded_pascal_string(size)
-        if column.character_set_name is not None:
-            str = str.decode(column.character_set_name)
-        return str
-
-    def __read_bit(self, column):
-        """Read MySQL BIT type"""
-        resp = ""
-        for byte in range(0, column.bytes):
-            current_byte = ""
-            data = self.packet.read_uint8()
-            if byte == 0:
-                if column.bytes == 1:
-                    end = column.bits
-                else:
-                    end = column.bits % 8
-                    if end == 0:
-                        end = 8
-            else:
-                end = 8
-            for bit in range(0, end):
-                if data & (1 << bit):
-                    current_byte += "1"
-                else:
-                    current_byte += "0"
-            resp += current_byte[::-1]
-        return resp
-
-    def __read_time(self):
-        time = self.packet.read_uint24()
-        date = datetime.time(
-            hour = int(time / 10000),
-            minute = int((time % 10000) / 100),
-            second = int(time % 100))
-        return date
-
-    def __read_date(self):
-        time = self.packet.read_uint24()
-
-        year = (time & ((1 << 15) - 1) << 9) >> 9
-        month = (time & ((1 << 4) - 1) << 5) >> 5
-        day = (time & ((1 << 5) - 1))
-
-        # In python, the year can't be zero, so if it is, then we'll just
-        # create a MySQL string ourselves
-        if year == 0:
-            return '{0}-{1}-{2}'.format(year, month, day)
-        else:
-            date = datetime.date(
-                    year=year,
-                    month=month,
-                    day=day
-            )
-            return date
-
-    def __read_datetime(self):
-        value = self.packet.read_uint64()
-        date = value / 1000000
-        time = value % 1000000
-
-        year = int(date / 10000)
-        month = int((date % 10000) / 100)
-        day = int(date % 100)
-        hour = int(time / 10000)
-        minute = int((time % 10000) / 100)
-        second = int(time % 100)
-
-        # Same problem as with date
-        if year == 0:
-            return '{0}-{1}-{2} {3}:{4}:{5}'.format(year, month, day,
-                    hour, minute, second)
-        else:
-            date = datetime.datetime(
-                    year=year,
-                    month=month,
-                    day=day,
-                    hour=hour,
-                    minute=minute,
-                    second=second
-                    )
-            return date
-    
-    def __read_new_decimal(self, column):
-        '''Read MySQL's new decimal format introduced in MySQL 5'''
-        
-        # This project was a great source of inspiration for
-        # understanding this storage format.
-        # https://github.com/jeremycole/mysql_binlog
-
-        digits_per_integer = 9
-        compressed_bytes = [0, 1, 1, 2, 2, 3, 3, 4, 4, 4]
-        integral = (column.precision - column.decimals)
-        uncomp_integral = int(integral / digits_per_integer)
-        uncomp_fractional = int(column.decimals / digits_per_integer)
-        comp_integral = integral - (uncomp_integral * digits_per_integer)
-        comp_fractional = column.decimals - (uncomp_fractional * digits_per_integer)
-
-        # Support negative
-        # The sign is encoded in the high bit of the the byte
-        # But this bit can also be used in the value
-        value = self.packet.read_uint8()
-        if value & 0x80 != 0:
-            res = ""
-            mask = 0
-        else:
-            mask = -1
-            res = "-"
-        self.packet.unread(struct.pack('<B', value ^ 0x80))
+        return self.__row_readers[image](self.packet, null_bitmap)
 
+    def _items(self, values, image = 0):
+        '''(column name, value) pairs of a row image in any row format'''
+        if self._mapping_rows:
+            return values.items()
+        return zip(self._image_decoders[image].names, values)
 
-        size = compressed_bytes[comp_integral]
-
-        if size > 0:
-            value = self.packet.read_int_be_by_size(size) ^ mask 
-            res += str(value)
-
-        for i in range(0, uncomp_integral):
-            value = struct.unpack('>i', self.packet.read(4))[0] ^ mask
-            res += str(value)
-
-        res += "."
-
-        for i in range(0, uncomp_fractional):
-            value = struct.unpack('>i', self.packet.read(4))[0] ^ mask
-            res += str(value)
-
-        size = compressed_bytes[comp_fractional]
-        if size > 0:
-            value = self.packet.read_int_be_by_size(size) ^ mask
-            res += str(value)
+    def _fetch_one_row(self):
+        return self._make_row([self._fetch_one_image(i) for i in range(0, self._images)])
 
-        return decimal.Decimal(res)
+    def _fetch_one_image(self, image = 0):
+        # The null bitmap only has the present columns
+        null_bitmap = self.packet.read((len(self._image_decoders[image].columns) + 7) / 8)
+        return self._read_column_data(null_bitmap, image)
 
     def _dump(self):
         super(RowsEvent, self)._dump()
@@ -247,10 +91,139 @@ class RowsEvent(BinLogEvent):
         print("Affected columns: %d" % (self.number_of_columns))
         print("Changed rows: %d" % (len(self.rows)))
 
+    def _seek_rows(self):
+        '''Move the packet cursor to the first row, the rows can be read many times'''
+        if self.__rows_start is None:
+            self.__rows_start = self.packet.read_bytes
+        else:
+            self.packet.advance(self.__rows_start - self.packet.read_bytes)
+
+    def fetch_columns(self, use_numpy = False):
+        '''Decode all the rows of the event by column.
+
+        Return a ColumnBatch, or a (before, after) pair of ColumnBatch for
+        update events. With use_numpy the numeric columns and the null
+        masks are numpy arrays. A batch only has the columns present in
+        its image.
+
+        When all the columns are NOT NULL and of a fixed width numeric
+        type the rows are decoded in one step instead of value by value.'''
+        if use_numpy and numpy is None:
+            raise ImportError("use_numpy requires numpy")
+        self._seek_rows()
+
+        row_format = ""
+        for decoder in self._image_decoders:
+            fmt = decoder.fixed_width_format()
+            if fmt is None:
+                break
+            row_format += "%dx%s" % ((len(decoder.columns) + 7) / 8, fmt)
+        else:
+            row_size = struct.calcsize("<" + row_format)
+            remaining = self.event_size - self.packet.read_bytes
+            if remaining % row_size == 0:
+                return self.__fetch_fixed_width_columns(row_format, row_size, remaining / row_size, use_numpy)
+
+        images = [decoder.new_columns() for decoder in self._image_decoders]
+        while self.packet.read_bytes < self.event_size:
+            for decoder, (values, nulls) in zip(self._image_decoders, images):
+                null_bitmap = self.packet.read((len(decoder.columns) + 7) / 8)
+                decoder.read_columns(self.packet, null_bitmap, values, nulls)
+        return self.__column_batches(images, use_numpy)
+
+    def __fetch_fixed_width_columns(self, row_format, row_size, count, use_numpy):
+        images = []
+        if use_numpy:
+            fields = []
+            for image, decoder in enumerate(self._image_decoders):
+                fields.append(("nulls%d" % image, "V%d" % ((len(decoder.columns) + 7) / 8)))
+                for i, column in enumerate(decoder.columns):
+                    fields.append(("c%d_%d" % (image, i), NUMPY_DTYPES[column.type][column.unsigned]))
+            data, offset = self.packet.read_buffer(row_size * count)
+            rows = numpy.frombuffer(data, numpy.dtype(fields), count, offset)
+            for image, decoder in enumerate(self._image_decoders):
+                ncolumns = len(decoder.columns)
+                values = [numpy.ascontiguousarray(rows["c%d_%d" % (image, i)]) for i in range(0, ncolumns)]
+                nulls = [numpy.zeros(count, dtype = bool) for i in range(0, ncolumns)]
+                images.append(ColumnBatch(decoder.names, values, nulls))
+        else:
+            # One unpack for all the rows, the columns are slices of the result
+            rows = self.packet.read_struct(struct.Struct("<" + row_format * count))
+            stride = sum([len(decoder.columns) for decoder in self._image_decoders])
+            start = 0
+            for decoder in self._image_decoders:
+                values, nulls = decoder.new_columns()
+                for i in range(0, len(decoder.columns)):
+                    column_values = rows[start + i::stride]
+                    if type(values[i]) is list:
+                        values[i] = list(column_values)
+                    else:
+                        values[i] = array.array(values[i].typecode, column_values)
+                    nulls[i] = array.array('B', [0]) * count
+                images.append(ColumnBatch(decoder.names, values, nulls))
+                start += len(decoder.columns)
+        if self._images == 1:
+            return images[0]
+        return tuple(images)
+
+    def __column_batches(self, images, use_numpy):
+        batches = []
+        for decoder, (values, nulls) in zip(self._image_decoders, images):
+            if use_numpy:
+                for i, column in enumerate(decoder.columns):
+                    if column.type in NUMPY_DTYPES:
+                        values[i] = numpy.array(values[i], dtype = NUMPY_DTYPES[column.type][column.unsigned])
+                    nulls[i] = numpy.array(nulls[i], dtype = bool)
+            batches.append(ColumnBatch(decoder.names, values, nulls))
+        if self._images == 1:
+            return batches[0]
+        return tuple(batches)
+
+    def _decode_task(self, with_columns = True):
+        '''Return what decode_rows needs to decode the rows of the event
+        in another process. Without with_columns only the id of the
+        decoder is sent, for the processes which already have it'''
+        self._seek_rows()
+        data, start = self.packet.read_buffer(0)
+        end = start + self.event_size - self.packet.read_bytes
+        bitmaps = [self.columns_present_bitmap]
+        if self._images == 2:
+            bitmaps.append(self.columns_present_bitmap2)
+        columns, options = None, None
+        if with_columns:
+            columns, options = self.columns, self.decoder.options
+        return (self.decoder.id, columns, options, self.row_format, bitmaps, data[start:end])
+
+    def _set_decoded_images(self, images):
+        '''Set the rows from the images returned by decode_rows'''
+        if self.row_format == "record":
+            images = [decoder.record_class._make(image)
+                for decoder, image in zip(itertools.cycle(self._image_decoders), images)]
+        self.__rows = [self._make_row(images[i:i + self._images])
+            for i in range(0, len(images), self._images)]
+
     def _fetch_rows(self):
+        self._seek_rows()
         self.__rows = []
         while self.packet.read_bytes < self.event_size:
             self.__rows.append(self._fetch_one_row())
+
+    def iter_rows(self):
+        '''Decode the rows one at a time, in the layout of rows. Unlike rows
+        they are not kept in the event, so large events don't need the
+        memory for all of their rows.'''
+        if self.__rows is not None:
+            for row in self.__rows:
+                yield row
+            return
+        self._seek_rows()
+        position = self.packet.read_bytes
+        while position < self.event_size:
+            # The packet can be read by someone else between two rows
+            self.packet.advance(position - self.packet.read_bytes)
+            row = self._fetch_one_row()
+            position = self.packet.read_bytes
+            yield row
     
     def __getattr__(self, name):
         if name == "rows":
@@ -260,63 +233,71 @@ class RowsEvent(BinLogEvent):
 
 
 class DeleteRowsEvent(RowsEvent):
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
-        super(DeleteRowsEvent, self).__init__(from_packet, event_size, table_map, ctl_connection)
-        self.columns_present_bitmap = self.packet.read((self.number_of_columns + 7) / 8)
+    # Number of row images per row
+    _images = 1
 
-    def _fetch_one_row(self):
-        row = {}
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(DeleteRowsEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
+        self.columns_present_bitmap, = self._read_columns_present_bitmaps()
+        # Names of the columns logged in the rows
+        self.columns_present = self._image_decoders[0].names
 
-        null_bitmap = self.packet.read((self.number_of_columns + 7) / 8)
-        row["values"] = self._read_column_data(null_bitmap)
-        return row
+    def _make_row(self, images):
+        if not self._mapping_rows:
+            return images[0]
+        return {"values": images[0]}
 
     def _dump(self):
         super(DeleteRowsEvent, self)._dump()
         print("Values:")
         for row in self.rows:
             print("--")
-            for key in row["values"]:
-                print("*", key, ":", row["values"][key])
+            if self._mapping_rows:
+                row = row["values"]
+            for key, value in self._items(row):
+                print("*", key, ":", value)
 
 
 class WriteRowsEvent(RowsEvent):
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
-        super(WriteRowsEvent, self).__init__(from_packet, event_size, table_map, ctl_connection)
-        self.columns_present_bitmap = self.packet.read((self.number_of_columns + 7) / 8)
+    _images = 1
 
-    def _fetch_one_row(self):
-        row = {}
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(WriteRowsEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
+        self.columns_present_bitmap, = self._read_columns_present_bitmaps()
+        # Names of the columns logged in the rows
+        self.columns_present = self._image_decoders[0].names
 
-        null_bitmap = self.packet.read((self.number_of_columns + 7) / 8)
-        row["values"] = self._read_column_data(null_bitmap)
-        return row
+    def _make_row(self, images):
+        if not self._mapping_rows:
+            return images[0]
+        return {"values": images[0]}
 
     def _dump(self):
         super(WriteRowsEvent, self)._dump()
         print("Values:")
         for row in self.rows:
             print("--")
-            for key in row["values"]:
-                print("*", key, ":", row["values"][key])
+            if self._mapping_rows:
+                row = row["values"]
+            for key, value in self._items(row):
+                print("*", key, ":", value)
 
 
 class UpdateRowsEvent(RowsEvent):
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
-        super(UpdateRowsEvent,self).__init__(from_packet, event_size, table_map, ctl_connection)
-        #Body
-        self.columns_present_bitmap = self.packet.read((self.number_of_columns + 7) / 8)
-        self.columns_present_bitmap2 = self.packet.read((self.number_of_columns + 7) / 8)
-
-    def _fetch_one_row(self):
-        row = {}
-        null_bitmap = self.packet.read((self.number_of_columns + 7) / 8)
+    _images = 2
 
-        row["before_values"] = self._read_column_data(null_bitmap)
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(UpdateRowsEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
+        #Body
+        self.columns_present_bitmap, self.columns_present_bitmap2 = self._read_columns_present_bitmaps()
+        # Names of the columns logged in the before and after images
+        self.columns_present = self._image_decoders[0].names
+        self.columns_present2 = self._image_decoders[1].names
 
-        null_bitmap = self.packet.read((self.number_of_columns + 7) / 8)
-        row["after_values"] = self._read_column_data(null_bitmap)
-        return row
+    def _make_row(self, images):
+        if not self._mapping_rows:
+            return tuple(images)
+        return {"before_values": images[0], "after_values": images[1]}
 
     def _dump(self):
         super(UpdateRowsEvent, self)._dump()
@@ -324,16 +305,19 @@ class UpdateRowsEvent(RowsEvent):
         print("Values:")
         for row in self.rows:
             print("--")
-            for key in row["before_values"]:
-                print("*", key, ":", row["before_values"][key], "=>", row["after_values"][key])
+            if self._mapping_rows:
+                row = (row["before_values"], row["after_values"])
+            after_values = dict(self._items(row[1], 1))
+            for key, value in self._items(row[0], 0):
+                print("*", key, ":", value, "=>", after_values.get(key))
 
 
 class TableMapEvent(BinLogEvent):
     '''This evenement describe the structure of a table.
     It's send before a change append on a table.
     A end user of the lib should have no usage of this'''
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
-        super(TableMapEvent, self).__init__(from_packet, event_size, table_map, ctl_connection)
+    def __init__(self, from_packet, event_size, table_map, ctl_connection, **kwargs):
+        super(TableMapEvent, self).__init__(from_packet, event_size, table_map, ctl_connection, **kwargs)
 
         # Post-Header
         self.table_id = self._read_table_id() 
@@ -350,24 +334,71 @@ class TableMapEvent(BinLogEvent):
         self.column_count = self.packet.read_length_coded_binary()
 
         self.columns = []
+        self.decoder = None
+        self.column_schemas = None
+
+        # Unwanted tables are remembered in the table map but their
+        # columns are never looked up nor decoded
+        self.wanted = self.__is_wanted(kwargs.get("only_schemas"), kwargs.get("only_tables"))
+        if not self.wanted:
+            return
+
+        #Read columns meta data
+        column_types = self.packet.read(self.column_count)
+        metadata_length = self.packet.read_length_coded_binary()
 
-        if self.table_id in table_map:
+        # Tables with the same layout share their columns and decoder. The
+        # null bitmap of the columns follows their metadata
+        layout_cache = kwargs.get("layout_cache")
+        null_bitmap_length = (self.column_count + 7) / 8
+        layout_key = (self.schema, self.table, column_types,
+            self.packet.peek(metadata_length + null_bitmap_length))
+        if layout_cache is not None and layout_key in layout_cache:
+            self.column_schemas, self.columns, self.decoder = layout_cache[layout_key]
+            self.packet.advance(metadata_length)
+            return
+
+        schema_catalog = kwargs.get("schema_catalog")
+        if self.table_id in table_map and table_map[self.table_id].wanted:
             self.column_schemas = table_map[self.table_id].column_schemas
+        elif schema_catalog is not None:
+            self.column_schemas = schema_catalog.get(self.schema, self.table)
+            # A catalog loaded from a file can be late on the server
+            if not columns_match(self.column_schemas, column_types) and self._ctl_connection is not None:
+                self.column_schemas = schema_catalog.fetch(self._ctl_connection, self.schema, self.table)
         else:
             self.column_schemas = self.__get_table_informations(self.schema, self.table)
+        # The columns of the server or of the catalog can be the ones of a
+        # later DDL, the rows would be decoded with the wrong columns
+        if not columns_match(self.column_schemas, column_types):
+            raise SchemaCatalogError("The known columns of %s.%s don't match the %d columns of its "
+                "TableMapEvent, the table was changed since" % (self.schema, self.table, self.column_count))
 
-        #Read columns meta data
-        column_types = list(self.packet.read(self.column_count))
-        metadata_length = self.packet.read_length_coded_binary()
+        metadata_start = self.packet.read_bytes
         for i in range(0, len(column_types)):
             column_type = column_types[i]
             column_schema = self.column_schemas[i]
             col = Column(byte2int(column_type), column_schema, from_packet)
             self.columns.append(col)
-
-
-        # TODO: get this informations instead of trashing data
-        # n              NULL-bitmask, length: (column-length * 8) / 7
+        # Skip the metadata of the column types we don't read
+        self.packet.advance(metadata_length - (self.packet.read_bytes - metadata_start))
+
+        # The nullability of the columns when the event was logged,
+        # information_schema can have the one of a later DDL
+        null_bitmap = self.packet.read(null_bitmap_length)
+        for i, col in enumerate(self.columns):
+            col.nullable = (byte2int(null_bitmap[i / 8]) >> (i % 8)) & 1 == 1
+
+        self.decoder = RowDecoder(self.columns, **kwargs.get("decoder_options", {}))
+        if layout_cache is not None:
+            layout_cache[layout_key] = (self.column_schemas, self.columns, self.decoder)
+
+    def __is_wanted(self, only_schemas, only_tables):
+        if only_schemas is not None and self.schema not in only_schemas:
+            return False
+        if only_tables is not None and self.table not in only_tables:
+            return False
+        return True
 
     def __get_table_informations(self, schema, table):
         cur = self._ctl_connection.cursor()
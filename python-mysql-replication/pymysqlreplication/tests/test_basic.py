@@ -1,9 +1,15 @@
 from pymysqlreplication.tests import base
-from pymysqlreplication import BinLogStreamReader
+from pymysqlreplication import BinLogStreamReader, AsyncBinLogStreamReader, BinLogFileReader
 from pymysqlreplication.event import *
 from pymysqlreplication.constants.BINLOG import *
 from pymysqlreplication.row_event import *
+from pymysqlreplication.catalog import SchemaCatalogError
 import time
+import os
+from decimal import Decimal
+import tempfile
+import asyncore
+import threading
 
 class TestBasicBinLogStreamReader(base.PyMySQLReplicationTestCase):
     def test_read_query_event(self):
@@ -56,6 +62,144 @@ class TestBasicBinLogStreamReader(base.PyMySQLReplicationTestCase):
         self.assertIsInstance(event, QueryEvent)
         self.assertEqual(event.query, query)
 
+    def test_filtering_events_from_other_schema(self):
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent])
+        self.execute("DROP DATABASE IF EXISTS pymysqlreplication_test_other")
+        self.execute("CREATE DATABASE pymysqlreplication_test_other")
+        self.execute("CREATE TABLE pymysqlreplication_test_other.test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))")
+        self.execute("INSERT INTO pymysqlreplication_test_other.test (data) VALUES('Other')")
+        self.execute("COMMIT")
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+        self.execute("INSERT INTO test (data) VALUES('Hello World')")
+        self.execute("COMMIT")
+
+        event = self.stream.fetchone()
+        self.assertIsInstance(event, WriteRowsEvent)
+        self.assertEqual(event.schema, "pymysqlreplication_test")
+        self.assertEqual(event.rows[0]["values"]["data"], "Hello World")
+        self.execute("DROP DATABASE pymysqlreplication_test_other")
+
+    def test_filtering_tables(self):
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [TableMapEvent, WriteRowsEvent],
+                only_tables = ["test"])
+        self.execute("CREATE TABLE test_other (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))")
+        self.execute("INSERT INTO test_other (data) VALUES('Other')")
+        self.execute("COMMIT")
+        self.execute("CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))")
+        self.execute("INSERT INTO test (data) VALUES('Hello World')")
+        self.execute("COMMIT")
+
+        event = self.stream.fetchone()
+        self.assertIsInstance(event, TableMapEvent)
+        self.assertEqual(event.table, "test")
+
+        event = self.stream.fetchone()
+        self.assertIsInstance(event, WriteRowsEvent)
+        self.assertEqual(event.table, "test")
+        self.assertEqual(event.rows[0]["values"]["data"], "Hello World")
+
+        other = [table_map for table_map in self.stream.table_map.values() if table_map.table == "test_other"]
+        self.assertEqual(len(other), 1)
+        self.assertFalse(other[0].wanted)
+        self.assertEqual(other[0].columns, [])
+
+    def test_preload_schemas(self):
+        self.execute("CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))")
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                preload_schemas = True)
+        columns = self.stream.schema_catalog.get("pymysqlreplication_test", "test")
+        self.assertEqual([column["COLUMN_NAME"] for column in columns], ["id", "data"])
+
+        self.execute("INSERT INTO test (data) VALUES('Hello World')")
+        self.execute("COMMIT")
+
+        event = self.stream.fetchone()
+        self.assertIsInstance(event, WriteRowsEvent)
+        self.assertEqual(event.rows[0]["values"]["data"], "Hello World")
+
+    def test_schema_catalog_file(self):
+        path = tempfile.mktemp()
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                schema_catalog_file = path)
+        self.execute("CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))")
+        self.execute("INSERT INTO test (data) VALUES('Hello')")
+        self.execute("COMMIT")
+
+        event = self.stream.fetchone()
+        self.assertEqual(event.rows[0]["values"]["data"], "Hello")
+
+        self.execute("ALTER TABLE test ADD COLUMN data2 VARCHAR (50)")
+        self.execute("INSERT INTO test (data, data2) VALUES('Hello', 'World')")
+        self.execute("COMMIT")
+
+        event = self.stream.fetchone()
+        self.assertEqual(event.rows[0]["values"]["data2"], "World")
+        self.stream.close()
+
+        self.stream = BinLogStreamReader(connection_settings = self.database, schema_catalog_file = path)
+        columns = self.stream.schema_catalog.get("pymysqlreplication_test", "test")
+        self.assertEqual([column["COLUMN_NAME"] for column in columns], ["id", "data", "data2"])
+        self.assertIsNotNone(self.stream.schema_catalog.log_file)
+        os.remove(path)
+        os.remove(path + ".prev")
+
+    def test_ddl_after_comment(self):
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent])
+        self.execute("CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))")
+        self.execute("INSERT INTO test (data) VALUES('Hello')")
+        self.execute("COMMIT")
+
+        event = self.stream.fetchone()
+        self.assertEqual(event.rows[0]["values"]["data"], "Hello")
+
+        self.execute("/* add data2 */ ALTER TABLE test ADD COLUMN data2 VARCHAR (50)")
+        self.execute("INSERT INTO test (data, data2) VALUES('Hello', 'World')")
+        self.execute("COMMIT")
+
+        event = self.stream.fetchone()
+        self.assertEqual(event.rows[0]["values"]["data2"], "World")
+
+    def test_table_changed_since_event(self):
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent])
+        self.execute("CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))")
+        self.execute("INSERT INTO test (data) VALUES('Hello')")
+        self.execute("COMMIT")
+        # Read after the change, the server only knows the new columns
+        self.execute("ALTER TABLE test MODIFY data INT")
+
+        self.assertRaises(SchemaCatalogError, self.stream.fetchone)
+
+    def test_table_map_layout_reuse(self):
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [TableMapEvent],
+                table_map_size = 1)
+        self.execute("CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))")
+        self.execute("CREATE TABLE test2 (id INT NOT NULL AUTO_INCREMENT, PRIMARY KEY (id))")
+        self.execute("INSERT INTO test (data) VALUES('Hello')")
+        self.execute("COMMIT")
+        self.execute("FLUSH TABLES")
+        self.execute("INSERT INTO test2 VALUES(NULL)")
+        self.execute("INSERT INTO test (data) VALUES('World')")
+        self.execute("COMMIT")
+
+        first = self.stream.fetchone()
+        self.assertEqual(first.table, "test")
+        other = self.stream.fetchone()
+        self.assertEqual(other.table, "test2")
+        second = self.stream.fetchone()
+        self.assertEqual(second.table, "test")
+        self.assertNotEqual(first.table_id, second.table_id)
+        self.assertIs(first.columns, second.columns)
+        self.assertIs(first.decoder, second.decoder)
+        self.assertEqual(len(self.stream.table_map), 1)
+
     def test_write_row_event(self):
         query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
         self.execute(query)
@@ -145,6 +289,104 @@ class TestBasicBinLogStreamReader(base.PyMySQLReplicationTestCase):
         self.assertEqual(event.rows[0]["after_values"]["id"], 1)        
         self.assertEqual(event.rows[0]["after_values"]["data"], "World")
 
+    def test_rows_event_use_table_map_decoder(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+        query = "INSERT INTO test (data) VALUES('Hello World')"
+        self.execute(query)
+        self.execute("COMMIT")
+
+        #RotateEvent
+        self.stream.fetchone()
+        #FormatDescription
+        self.stream.fetchone()
+        #QueryEvent for the Create Table
+        self.stream.fetchone()
+
+        #QueryEvent for the BEGIN
+        self.stream.fetchone()
+
+        table_map = self.stream.fetchone()
+        self.assertIsInstance(table_map, TableMapEvent)
+        self.assertEqual(table_map.decoder.names, ['id', 'data'])
+
+        event = self.stream.fetchone()
+        self.assertIs(event.decoder, table_map.decoder)
+        self.assertEqual(event.rows[0]["values"]["data"], "Hello World")
+
+    def test_update_row_event_compact_formats(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+        query = "INSERT INTO test (data) VALUES('Hello')"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        query = "UPDATE test SET data = 'World' WHERE id = 1"
+        self.execute(query)
+        self.execute("COMMIT")
+
+        for row_format in ["tuple", "record"]:
+            self.stream.close()
+            self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [UpdateRowsEvent],
+                    row_format = row_format)
+            event = self.stream.fetchone()
+            self.assertIsInstance(event, UpdateRowsEvent)
+            self.assertEqual(event.column_names, ["id", "data"])
+            before_values, after_values = event.rows[0]
+            self.assertEqual(tuple(before_values), (1, "Hello"))
+            self.assertEqual(tuple(after_values), (1, "World"))
+            if row_format == "record":
+                self.assertEqual(after_values.data, "World")
+
+    def test_write_row_event_lazy_format(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50), amount DECIMAL(10, 2), PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        query = "INSERT INTO test (data, amount) VALUES('Hello', 12.5)"
+        self.execute(query)
+        self.execute("COMMIT")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                row_format = "lazy")
+        event = self.stream.fetchone()
+        self.assertIsInstance(event, WriteRowsEvent)
+        values = event.rows[0]["values"]
+        self.assertEqual(values["id"], 1)
+        self.assertEqual(values.raw("data"), "\x05Hello")
+        self.assertFalse(values.is_null("amount"))
+        self.assertEqual(values.to_dict(), {"id": 1, "data": "Hello", "amount": Decimal("12.50")})
+
+    def test_update_row_event_minimal_image(self):
+        cur = self.conn_control.cursor()
+        cur.execute("SHOW VARIABLES LIKE 'binlog_row_image'")
+        if cur.fetchone() is None:
+            self.skipTest("binlog_row_image requires MySQL 5.6")
+
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, other INT, PRIMARY KEY (id))"
+        self.execute(query)
+        query = "INSERT INTO test (data, other) VALUES('Hello', 1)"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        self.execute("SET SESSION binlog_row_image = 'MINIMAL'")
+        query = "UPDATE test SET data = 'World' WHERE id = 1"
+        self.execute(query)
+        self.execute("COMMIT")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [UpdateRowsEvent])
+        event = self.stream.fetchone()
+        self.assertIsInstance(event, UpdateRowsEvent)
+        self.assertEqual(event.columns_present, ["id"])
+        self.assertEqual(event.columns_present2, ["data"])
+        self.assertEqual(event.rows[0]["before_values"], {"id": 1})
+        self.assertEqual(event.rows[0]["after_values"], {"data": "World"})
+
 class TestMultipleRowBinLogStreamReader(base.PyMySQLReplicationTestCase):
     def test_insert_multiple_row_event(self):
         query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
@@ -251,6 +493,282 @@ class TestMultipleRowBinLogStreamReader(base.PyMySQLReplicationTestCase):
         self.assertEqual(event.rows[1]["values"]["id"], 2)        
         self.assertEqual(event.rows[1]["values"]["data"], "World")
 
+    def test_fetch_columns(self):
+        query = "CREATE TABLE test (id INT NOT NULL, data VARCHAR (50), PRIMARY KEY (id))"
+        self.execute(query)
+        query = "CREATE TABLE test2 (id INT NOT NULL, value BIGINT UNSIGNED NOT NULL)"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        self.execute("INSERT INTO test VALUES(1, 'Hello'), (2, NULL)")
+        self.execute("INSERT INTO test2 VALUES(1, 10), (2, 20)")
+        self.execute("UPDATE test2 SET value = value + 1")
+        self.execute("COMMIT")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database,
+                only_events = [WriteRowsEvent, UpdateRowsEvent])
+
+        event = self.stream.fetchone()
+        columns = event.fetch_columns()
+        self.assertEqual(len(columns), 2)
+        self.assertEqual(list(columns["id"]), [1, 2])
+        self.assertEqual(columns["data"], ["Hello", None])
+        self.assertEqual(list(columns.nulls[1]), [0, 1])
+        # The rows are still available
+        self.assertEqual(event.rows[1]["values"], {"id": 2, "data": None})
+
+        # Fixed width columns only
+        event = self.stream.fetchone()
+        columns = event.fetch_columns()
+        self.assertEqual(list(columns["value"]), [10, 20])
+
+        event = self.stream.fetchone()
+        before, after = event.fetch_columns()
+        self.assertEqual(list(before["value"]), [10, 20])
+        self.assertEqual(list(after["value"]), [11, 21])
+
+    def test_read_ahead(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        for i in range(0, 10):
+            self.execute("INSERT INTO test (data) VALUES('Hello %d')" % (i))
+        self.execute("COMMIT")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                read_ahead = True, read_ahead_packets = 2)
+        for i in range(0, 10):
+            event = self.stream.fetchone()
+            self.assertIsInstance(event, WriteRowsEvent)
+            self.assertEqual(event.rows[0]["values"]["data"], "Hello %d" % (i))
+        self.assertIsNone(self.stream.fetchone())
+
+    def test_decode_processes(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        for i in range(0, 20):
+            self.execute("INSERT INTO test (data) VALUES('Hello %d')" % (i))
+            if i == 10:
+                self.execute("UPDATE test SET data = 'World' WHERE id = 1")
+        self.execute("COMMIT")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database,
+                only_events = [WriteRowsEvent, UpdateRowsEvent], decode_processes = 2)
+        for i in range(0, 20):
+            event = self.stream.fetchone()
+            self.assertIsInstance(event, WriteRowsEvent)
+            self.assertEqual(event.rows[0]["values"]["data"], "Hello %d" % (i))
+            if i == 10:
+                event = self.stream.fetchone()
+                self.assertIsInstance(event, UpdateRowsEvent)
+                self.assertEqual(event.rows[0]["after_values"]["data"], "World")
+        self.assertIsNone(self.stream.fetchone())
+
+    def test_async_reader(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        query = "INSERT INTO test (data) VALUES('Hello'),('World')"
+        self.execute(query)
+        self.execute("COMMIT")
+
+        events = []
+        channels = {}
+        reader = AsyncBinLogStreamReader(events.append, map = channels,
+                connection_settings = self.database, only_events = [WriteRowsEvent])
+        reader.start()
+        asyncore.loop(map = channels, timeout = 1)
+        reader.close()
+
+        self.assertEqual(len(events), 2)
+        self.assertIsInstance(events[0], WriteRowsEvent)
+        self.assertEqual(events[0].rows[1]["values"]["data"], "World")
+        # End of the non blocking stream
+        self.assertIsNone(events[1])
+
+    def test_iter_rows(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        query = "INSERT INTO test (data) VALUES('Hello'),('World')"
+        self.execute(query)
+        self.execute("COMMIT")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent])
+        event = self.stream.fetchone()
+        rows = event.iter_rows()
+        self.assertEqual(next(rows)["values"], {"id": 1, "data": "Hello"})
+        self.assertEqual(next(rows)["values"], {"id": 2, "data": "World"})
+        self.assertRaises(StopIteration, next, rows)
+        self.assertEqual(len(event.rows), 2)
+
+    def test_rotate_event(self):
+        self.execute("FLUSH LOGS")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [RotateEvent])
+        event = self.stream.fetchone()
+        self.assertIsInstance(event, RotateEvent)
+        self.assertEqual(event.position, 4)
+        self.assertEqual(event.next_binlog, "mysql-bin.000001")
+        event = self.stream.fetchone()
+        self.assertIsInstance(event, RotateEvent)
+        self.assertEqual(event.position, 4)
+        self.assertEqual(event.next_binlog, "mysql-bin.000002")
+        self.assertEqual(self.stream.log_file, "mysql-bin.000002")
+        self.assertEqual(self.stream.log_pos, 4)
+
+    def test_resume_from_position(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        self.execute("INSERT INTO test (data) VALUES('Hello')")
+        self.execute("COMMIT")
+        self.execute("FLUSH LOGS")
+        self.execute("INSERT INTO test (data) VALUES('World')")
+        self.execute("COMMIT")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent])
+        event = self.stream.fetchone()
+        self.assertEqual(event.rows[0]["values"]["data"], "Hello")
+        log_file, log_pos = self.stream.log_file, self.stream.log_pos
+        self.assertEqual(log_file, "mysql-bin.000001")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                log_file = log_file, log_pos = log_pos)
+        event = self.stream.fetchone()
+        self.assertEqual(event.rows[0]["values"]["data"], "World")
+        self.assertEqual(event.log_file, "mysql-bin.000002")
+        self.assertIsNone(self.stream.fetchone())
+
+    def test_file_reader(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        self.execute("INSERT INTO test (data) VALUES('Hello'),('World')")
+        self.execute("COMMIT")
+        cur = self.conn_control.cursor()
+        cur.execute("SHOW MASTER STATUS")
+        log_file = cur.fetchone()[0]
+        cur.execute("SELECT @@datadir")
+        datadir = cur.fetchone()[0]
+        self.execute("FLUSH LOGS")
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, preload_schemas = True)
+        reader = BinLogFileReader([os.path.join(datadir, log_file)], schema_catalog = self.stream.schema_catalog,
+                only_events = [WriteRowsEvent, XidEvent])
+        event = reader.fetchone()
+        self.assertIsInstance(event, WriteRowsEvent)
+        self.assertEqual(event.rows[0]["values"], {"id": 1, "data": "Hello"})
+        self.assertEqual(event.rows[1]["values"], {"id": 2, "data": "World"})
+        self.assertEqual(event.log_file, log_file)
+        self.assertIsInstance(reader.fetchone(), XidEvent)
+        self.assertIsNone(reader.fetchone())
+        reader.close()
+
+    def test_relay_log(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        for i in range(0, 10):
+            self.execute("INSERT INTO test (data) VALUES('Hello %d')" % (i))
+        self.execute("COMMIT")
+
+        relay_log_dir = tempfile.mkdtemp()
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                relay_log_dir = relay_log_dir, relay_log_segment_size = 1024)
+        for i in range(0, 5):
+            event = self.stream.fetchone()
+            self.assertEqual(event.rows[0]["values"]["data"], "Hello %d" % (i))
+        log_file, log_pos = self.stream.log_file, self.stream.log_pos
+        self.assertTrue(len(self.stream.relay_log.segments()) > 1)
+
+        # Read again from the relay log, without the master
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                relay_log_dir = relay_log_dir, relay_log_segment_size = 1024, log_file = log_file, log_pos = log_pos)
+        self.stream.relay_log.purge(log_file, log_pos)
+        for i in range(5, 10):
+            event = self.stream.fetchone()
+            self.assertEqual(event.rows[0]["values"]["data"], "Hello %d" % (i))
+        self.assertIsNone(self.stream.fetchone())
+
+    def test_heartbeat(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                blocking = True, heartbeat_period = 0.1)
+        self.execute("INSERT INTO test (data) VALUES('Hello')")
+        self.execute("COMMIT")
+        event = self.stream.fetchone()
+        self.assertEqual(event.rows[0]["values"]["data"], "Hello")
+        log_pos = self.stream.log_pos
+
+        # The heartbeats sent meanwhile are not returned and don't move the position
+        time.sleep(1)
+        self.execute("INSERT INTO test (data) VALUES('World')")
+        self.execute("COMMIT")
+        event = self.stream.fetchone()
+        self.assertIsInstance(event, WriteRowsEvent)
+        self.assertEqual(event.rows[0]["values"]["data"], "World")
+        self.assertTrue(self.stream.log_pos > log_pos)
+
+    def test_read_timeout(self):
+        query = "CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))"
+        self.execute(query)
+
+        self.resetBinLog()
+
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                blocking = True, read_timeout = 0.2)
+        self.execute("INSERT INTO test (data) VALUES('Hello')")
+        self.execute("COMMIT")
+        event = self.stream.fetchone()
+        self.assertEqual(event.rows[0]["values"]["data"], "Hello")
+        connection = self.stream._stream_connection
+
+        # Without heartbeats the idle connection looks dead, the reader
+        # reconnects after the last event read until the next one comes
+        def insert():
+            self.execute("INSERT INTO test (data) VALUES('World')")
+            self.execute("COMMIT")
+        timer = threading.Timer(1, insert)
+        timer.start()
+        event = self.stream.fetchone()
+        timer.join()
+        self.assertIsNot(self.stream._stream_connection, connection)
+        self.assertEqual(event.rows[0]["values"]["data"], "World")
+        self.assertEqual(len(event.rows), 1)
+
 __all__ = ["TestBasicBinLogStreamReader", "TestMultipleRowBinLogStreamReader"]
 
 if __name__ == "__main__":
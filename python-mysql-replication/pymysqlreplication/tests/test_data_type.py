@@ -69,6 +69,28 @@ class TestDataType(base.PyMySQLReplicationTestCase):
         self.assertEqual(event.rows[0]["values"]["test"], Decimal("4.2"))
         self.assertEqual(event.rows[0]["values"]["test2"], Decimal("42000.123456")) 
 
+    def test_decimal_three_bytes_group(self):
+        create_query = "CREATE TABLE test (test DECIMAL(6,0))"
+        insert_query = "INSERT INTO test VALUES(128)"
+        event = self.create_and_insert_value(create_query, insert_query)
+        self.assertEqual(event.rows[0]["values"]["test"], Decimal("128"))
+
+    def test_decimal_leading_zeros(self):
+        create_query = "CREATE TABLE test (test DECIMAL(20,10), test2 DECIMAL(5,2))"
+        insert_query = "INSERT INTO test VALUES(42000.0123456789, -1.05)"
+        event = self.create_and_insert_value(create_query, insert_query)
+        self.assertEqual(event.rows[0]["values"]["test"], Decimal("42000.0123456789"))
+        self.assertEqual(event.rows[0]["values"]["test2"], Decimal("-1.05"))
+
+    def test_decimal_as_int(self):
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, decimal_as_int = True)
+        create_query = "CREATE TABLE test (test DECIMAL(20,10), test2 DECIMAL(5,2))"
+        insert_query = "INSERT INTO test VALUES(42000.0123456789, -1.05)"
+        event = self.create_and_insert_value(create_query, insert_query)
+        self.assertEqual(event.rows[0]["values"]["test"], 420000123456789)
+        self.assertEqual(event.rows[0]["values"]["test2"], -105)
+
     def test_tiny(self):
         create_query = "CREATE TABLE test (id TINYINT UNSIGNED NOT NULL, test TINYINT)"
         insert_query = "INSERT INTO test VALUES(255, -128)"
@@ -143,6 +165,22 @@ class TestDataType(base.PyMySQLReplicationTestCase):
         event = self.create_and_insert_value(create_query, insert_query)
         self.assertEqual(event.rows[0]["values"]["test"], datetime.datetime(1984, 12, 3, 12, 33, 7)) 
 
+    def test_temporal_raw_and_epoch(self):
+        create_query = "CREATE TABLE test (test DATETIME, test2 DATE, test3 TIME)"
+        insert_query = "INSERT INTO test VALUES('1984-12-03 12:33:07', '1984-12-03', '12:33:07')"
+        self.execute(create_query)
+        self.execute(insert_query)
+        self.execute("COMMIT")
+
+        for temporal_format, expected in [("raw", (19841203123307, (1984 << 9) + (12 << 5) + 3, 123307)),
+                ("epoch", (470925187, 470880000, 45187))]:
+            self.stream.close()
+            self.stream = BinLogStreamReader(connection_settings = self.database, only_events = [WriteRowsEvent],
+                    temporal_format = temporal_format)
+            event = self.stream.fetchone()
+            values = event.rows[0]["values"]
+            self.assertEqual((values["test"], values["test2"], values["test3"]), expected)
+
     def test_year(self):
         create_query = "CREATE TABLE test (a YEAR(4), b YEAR(2))"
         insert_query = "INSERT INTO test VALUES(1984, 1984)"
@@ -182,6 +220,16 @@ class TestDataType(base.PyMySQLReplicationTestCase):
         self.assertEqual(event.rows[0]["values"]["test4"], "101100111")
         self.assertEqual(event.rows[0]["values"]["test5"], "1101011010110100100111100011010100010100101110111011101011011010")
 
+    def test_bit_as_int(self):
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, bit_as_int = True)
+        create_query = "CREATE TABLE test (test BIT(6), test2 BIT(64))"
+        insert_query = "INSERT INTO test VALUES(b'100010', \
+                    b'1101011010110100100111100011010100010100101110111011101011011010')"
+        event = self.create_and_insert_value(create_query, insert_query)
+        self.assertEqual(event.rows[0]["values"]["test"], 0b100010)
+        self.assertEqual(event.rows[0]["values"]["test2"], 0b1101011010110100100111100011010100010100101110111011101011011010)
+
     def test_enum(self):
         create_query = "CREATE TABLE test (test ENUM('a', 'ba', 'c'), test2 ENUM('a', 'ba', 'c')) CHARACTER SET latin1 COLLATE latin1_bin;"
         insert_query = "INSERT INTO test VALUES('ba', 'a')"
@@ -196,6 +244,13 @@ class TestDataType(base.PyMySQLReplicationTestCase):
         self.assertEqual(event.rows[0]["values"]["test"], 'ba')
         self.assertEqual(event.rows[0]["values"]["test2"], 'a')
 
+    def test_set_many_values(self):
+        values = ", ".join(["'v%d'" % i for i in range(0, 20)])
+        create_query = "CREATE TABLE test (test SET(%s)) CHARACTER SET latin1 COLLATE latin1_bin;" % (values)
+        insert_query = "INSERT INTO test VALUES('v0,v7,v8,v19')"
+        event = self.create_and_insert_value(create_query, insert_query)
+        self.assertEqual(event.rows[0]["values"]["test"], 'v0,v7,v8,v19')
+
     def test_tiny_blob(self):
         create_query = "CREATE TABLE test (test TINYBLOB, test2 TINYTEXT) CHARACTER SET latin1 COLLATE latin1_bin;"
         insert_query = "INSERT INTO test VALUES('Hello', 'World')"
@@ -203,6 +258,16 @@ class TestDataType(base.PyMySQLReplicationTestCase):
         self.assertEqual(event.rows[0]["values"]["test"], b'Hello') 
         self.assertEqual(event.rows[0]["values"]["test2"], 'World') 
 
+    def test_raw_strings(self):
+        self.stream.close()
+        self.stream = BinLogStreamReader(connection_settings = self.database, raw_strings = True)
+        create_query = "CREATE TABLE test (test BLOB, test2 VARCHAR(10)) CHARACTER SET utf8;"
+        insert_query = "INSERT INTO test VALUES('Hello', '\xc3\xa9t\xc3\xa9')"
+        event = self.create_and_insert_value(create_query, insert_query)
+        self.assertIsInstance(event.rows[0]["values"]["test"], memoryview)
+        self.assertEqual(event.rows[0]["values"]["test"].tobytes(), b'Hello')
+        self.assertEqual(event.rows[0]["values"]["test2"].tobytes(), b'\xc3\xa9t\xc3\xa9')
+
     def test_medium_blob(self):
         create_query = "CREATE TABLE test (test MEDIUMBLOB, test2 MEDIUMTEXT) CHARACTER SET latin1 COLLATE latin1_bin;"
         insert_query = "INSERT INTO test VALUES('Hello', 'World')"
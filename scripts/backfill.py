@@ -0,0 +1,74 @@
+# Copyright 2013 MemSQL, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use
+# this file except in compliance with the License.  You may obtain a copy of the
+# License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations under the License.
+
+# Applies binlog files already on the disk to MemSQL. The files are decoded
+# by a pool of processes, and the queries are run in the binlog order. The
+# columns of the tables come from a schema catalog valid at the first file
+
+from replication_utils import *
+import multiprocessing
+import sys
+
+def add_backfill_arguments(parser):
+    parser.add_argument('files', nargs='+', help='Binlog files to apply, in the binlog order')
+    parser.add_argument('--schema-catalog', dest='schema_catalog', type=str, required=True,
+            help='Schema catalog saved by replicate.py --schema-catalog at or before the first file, '
+                 'with no DDL of the database in between nor in the files')
+    parser.add_argument('--processes', dest='processes', type=int, default=multiprocessing.cpu_count(),
+            help='Number of processes decoding the files')
+
+args = parse_commandline(add_backfill_arguments)
+try:
+    load_schema_catalog(args.schema_catalog, args.files, args.database)
+except SchemaCatalogError as e:
+    sys.exit('error: {0}'.format(e))
+
+memsql_conn = connect_to_memsql(args, dump=False)
+checkpoint = open_checkpoint(args)
+
+# Skips the files applied before a restart
+files = args.files
+position = checkpoint.load() if checkpoint is not None else None
+if position is not None:
+    print 'restarting from {0}:{1}'.format(*position)
+    files = [f for f in files if os.path.basename(f) >= position[0]]
+tasks = []
+for f in files:
+    log_pos = position[1] if position is not None and os.path.basename(f) == position[0] else None
+    tasks.append((f, args.schema_catalog, args.database, args.raw_strings, log_pos))
+
+if checkpoint is not None:
+    checkpoint.start()
+pool = multiprocessing.Pool(args.processes)
+try:
+    for path, transactions in decode_in_order(pool, tasks, args.processes * 2):
+        print 'applying', path
+        for queries, (log_file, log_pos) in transactions:
+            for q in queries:
+                try:
+                    memsql_conn.execute(q[0], *q[1])
+                except Exception as e:
+                    print 'error:', e
+                    # The checkpoint stays before the failed transaction
+                    if checkpoint is not None:
+                        pool.terminate()
+                        raise
+            if checkpoint is not None:
+                checkpoint.update(log_file, log_pos)
+except KeyboardInterrupt:
+    print '\nExiting'
+    pool.terminate()
+finally:
+    if checkpoint is not None:
+        checkpoint.close()
+pool.close()
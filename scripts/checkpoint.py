@@ -0,0 +1,140 @@
+# Copyright 2013 MemSQL, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use
+# this file except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations under the License.
+
+# Records how far the binlog was applied, so the replication can restart
+# from there instead of from a new dump
+
+import _mysql
+import abc
+import json
+import os
+import threading
+
+class Checkpoint(object):
+    """Position (binlog file, offset) after the last fully applied transaction
+
+    update() only keeps the position in memory. After start(), a thread
+    writes it every `interval' seconds when it changed, also while the
+    binlog is idle, and close() writes it a last time. After a crash, the
+    transactions applied since the last write are applied again.
+
+    on_save, if set, is called with the position after each write.
+    """
+
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.position = None
+        self.on_save = None
+        self._saved = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @abc.abstractmethod
+    def load(self):
+        """Returns the saved (log_file, log_pos), or None"""
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='checkpoint')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def update(self, log_file, log_pos):
+        """Records that the transactions up to the position are applied"""
+        with self._lock:
+            self.position = (log_file, log_pos)
+
+    def flush(self):
+        """Returns True if the position was written"""
+        with self._lock:
+            position = self.position
+            if position is None or position == self._saved:
+                return False
+            self._save(*position)
+            self._saved = position
+        if self.on_save is not None:
+            self.on_save(*position)
+        return True
+
+    def close(self):
+        """Stops the thread and writes the last position"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    @abc.abstractmethod
+    def _save(self, log_file, log_pos):
+        """Writes the position durably"""
+
+class FileCheckpoint(Checkpoint):
+    """Checkpoint kept in a local file, replaced atomically and fsync'd"""
+
+    def __init__(self, path, interval=1.0):
+        super(FileCheckpoint, self).__init__(interval)
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            data = json.load(f)
+        return (str(data['log_file']), data['log_pos'])
+
+    def _save(self, log_file, log_pos):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'log_file': log_file, 'log_pos': log_pos}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, self.path)
+        # The rename is durable once the directory is synced
+        fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+class TableCheckpoint(Checkpoint):
+    """Checkpoint kept in a one row table of MemSQL, next to the replicated data"""
+
+    def __init__(self, conn, table, interval=1.0):
+        super(TableCheckpoint, self).__init__(interval)
+        self.conn = conn
+        self.table = table
+        self._created = False
+
+    def load(self):
+        try:
+            rows = self.conn.query('SELECT log_file, log_pos FROM {0} WHERE id = 1'.format(self.table))
+        except _mysql.MySQLError:
+            # No database or no table yet
+            return None
+        if len(rows) == 0:
+            return None
+        return (rows[0]['log_file'], int(rows[0]['log_pos']))
+
+    def _save(self, log_file, log_pos):
+        if not self._created:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS {0} (id INT PRIMARY KEY, '
+                    'log_file VARCHAR(255) NOT NULL, log_pos BIGINT NOT NULL)'.format(self.table))
+            self._created = True
+        self.conn.execute('REPLACE INTO {0} (id, log_file, log_pos) VALUES (1, %s, %s)'.format(self.table),
+                log_file, log_pos)
@@ -13,15 +13,32 @@
 
 from replication_utils import *
 
-args = parse_commandline()
+def add_replicate_arguments(parser):
+    parser.add_argument('--schema-catalog', dest='schema_catalog', type=str, default=None,
+            help='File where the columns of the tables are saved with their binlog position, read '
+                 'at restart instead of MySQL. It can be used by backfill.py')
+
+args = parse_commandline(add_replicate_arguments)
+
+# Restarts from the last applied transaction if a checkpoint was saved
+checkpoint = open_checkpoint(args)
+position = checkpoint.load() if checkpoint is not None else None
+if position is not None:
+    print 'restarting from {0}:{1}'.format(*position)
 
 # Connects to MySQL and MemSQL
-stream = connect_to_mysql_stream(args)
-memsql_conn = connect_to_memsql(args)
+stream = connect_to_mysql_stream(args, position=position, schema_catalog_file=args.schema_catalog)
+memsql_conn = connect_to_memsql(args, dump=position is None)
 memsql_conn.print_queries = True
 
 print 'listening'
 
+if checkpoint is not None:
+    if stream.relay_log is not None:
+        # The relay log before the checkpoint isn't needed anymore
+        checkpoint.on_save = stream.relay_log.purge
+    checkpoint.start()
+
 try:
     # Reads the MySQL binlog and executes the retrieved queries in MemSQL
     for binlogevent in stream:
@@ -32,6 +49,19 @@ try:
                             memsql_conn.execute(q[0], *q[1])
                     except Exception as e:
                             print 'error:', e
+                            # The checkpoint stays before the failed transaction,
+                            # a restart applies it again
+                            if checkpoint is not None:
+                                    raise
+            if checkpoint is not None and is_transaction_end(binlogevent):
+                    checkpoint.update(binlogevent.log_file, binlogevent.log_pos)
+                    # The stream saved the catalog at the position of the DDL,
+                    # a restart before it would read the previous version
+                    if isinstance(binlogevent, QueryEvent) and is_ddl(binlogevent.query):
+                            checkpoint.flush()
 except KeyboardInterrupt:
     print '\nExiting'
+finally:
     stream.close()
+    if checkpoint is not None:
+        checkpoint.close()
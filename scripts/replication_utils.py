@@ -14,12 +14,15 @@
 import MySQLdb
 import MySQLdb.converters
 import memsql_database
+import checkpoint
 
-from pymysqlreplication import BinLogStreamReader
+from pymysqlreplication import BinLogStreamReader, BinLogFileReader
+from pymysqlreplication.catalog import SchemaCatalog, SchemaCatalogError, is_ddl
 from pymysqlreplication.row_event import *
 from pymysqlreplication.event import *
 
 import argparse
+import collections
 import datetime
 import subprocess
 import os
@@ -33,6 +36,9 @@ def fix_object(value):
     # unicode values properly
     if isinstance(value, unicode):
         return value.encode('utf-8')
+    elif isinstance(value, memoryview):
+        # Undecoded value read with raw_strings, already in the column charset
+        return value.tobytes()
     else:
         return value
 
@@ -43,8 +49,11 @@ def compare_items((k, v)):
     else:
         return '`%s`=%%s'%k
 
-def parse_commandline():
-        """Parses the commandline-arguments that one could enter to a script replicating MySQL to MemSQL"""
+def parse_commandline(add_arguments=None):
+        """Parses the commandline-arguments that one could enter to a script replicating MySQL to MemSQL
+
+        add_arguments is called with the parser to add the arguments of a script
+        """
 
         parser = argparse.ArgumentParser(description='Replicate a MySQL database to MemSQL')
         parser.add_argument('database', help='Database to use')
@@ -57,6 +66,20 @@ def parse_commandline():
                 default=False, help="Don't run mysqldump before reading (expects schema to already be set up)")
         parser.add_argument('--no-flush', dest='no_flush', action='store_true',
                 default=False, help="Don't flush the binlog before reading (may duplicate existing data)")
+        parser.add_argument('--raw-strings', dest='raw_strings', action='store_true',
+                default=False, help="Send the string and blob values as read from the binlog, without decoding them")
+        parser.add_argument('--checkpoint-file', dest='checkpoint_file', type=str, default=None,
+                help='File where the binlog position of the last applied transaction is saved, to restart from it without a dump')
+        parser.add_argument('--checkpoint-table', dest='checkpoint_table', type=str, default=None,
+                help='MemSQL table of the replicated database where the binlog position is saved, instead of a file')
+        parser.add_argument('--checkpoint-interval', dest='checkpoint_interval', type=float, default=1.0,
+                help='Seconds between two writes of the checkpoint')
+        parser.add_argument('--relay-log', dest='relay_log', type=str, default=None,
+                help='Directory where the binlog is copied as fast as it comes, before being applied. '
+                'The copy is removed once applied, with a checkpoint')
+
+        if add_arguments is not None:
+            add_arguments(parser)
 
         args = parser.parse_args()
         return args
@@ -69,8 +92,30 @@ def get_memsql_settings(args):
     return {'host': args.host+':'+str(args.memsql_port), 'user': args.user,
             'database':args.database, 'password': args.password}
 
-def connect_to_mysql_stream(args, blocking=True):
-    """Returns an iterator through the latest MySQL binlog
+def open_checkpoint(args):
+    """Returns the checkpoint store selected by the arguments, or None
+
+    Expects that the `args' argument was obtained from the
+    parse_commandline() function (or something very similar)
+    """
+
+    if args.checkpoint_file is not None:
+        return checkpoint.FileCheckpoint(args.checkpoint_file, args.checkpoint_interval)
+    elif args.checkpoint_table is not None:
+        # Not connected to the database, which is only created by the dump
+        memsql_settings = get_memsql_settings(args)
+        memsql_settings['database'] = ''
+        conn = memsql_database.Connection(**memsql_settings)
+        table = '`{0}`.`{1}`'.format(args.database, args.checkpoint_table)
+        return checkpoint.TableCheckpoint(conn, table, args.checkpoint_interval)
+    return None
+
+def connect_to_mysql_stream(args, blocking=True, position=None, schema_catalog_file=None):
+    """Returns an iterator through the latest MySQL binlog, or through the
+    binlog from `position', a (log_file, log_pos) pair
+
+    With `schema_catalog_file', the columns of the tables are read from
+    and saved to this file instead of being queried from MySQL at start
 
     Expects that the `args' argument was obtained from the
     parse_commandline() function (or something very similar)
@@ -81,22 +126,27 @@ def connect_to_mysql_stream(args, blocking=True):
     ##server_id is your slave identifier. It should be unique
     ##blocking: True if you want to block and wait for the next event at the end of the stream
     server_id = int(binascii.hexlify(os.urandom(4)), 16) # A random 4-byte int
+    log_file, log_pos = position if position is not None else (None, None)
     stream = BinLogStreamReader(connection_settings = mysql_settings,
                     server_id = server_id, blocking = blocking, only_events =
-                    [DeleteRowsEvent, WriteRowsEvent, UpdateRowsEvent, QueryEvent])
+                    [DeleteRowsEvent, WriteRowsEvent, UpdateRowsEvent, QueryEvent, XidEvent],
+                    raw_strings = args.raw_strings, log_file = log_file, log_pos = log_pos,
+                    relay_log_dir = args.relay_log, schema_catalog_file = schema_catalog_file)
 
     return stream
 
-def connect_to_memsql(args):
+def connect_to_memsql(args, dump=True):
     """Connects to a MemSQL instance to replicate to
 
     Expects that the `args' argument was obtained from the
-    parse_commandline() function (or something very similar)
+    parse_commandline() function (or something very similar).
+    With dump=False, the database is neither dumped nor flushed, like
+    when the replication restarts from a checkpoint
     """
 
     # Dumps database and flushes logs based on flags
     mysql_settings = get_mysql_settings(args)
-    if not args.no_dump:
+    if dump and not args.no_dump:
         # Dump with mysqldump
         dumpcommand = ['mysqldump', '--user='+args.user, '--host='+args.host,
             '--port='+str(args.mysql_port), '--database', args.database, '--force']
@@ -118,7 +168,7 @@ def connect_to_memsql(args):
         p = subprocess.Popen(mysqlcommand, stdin=subprocess.PIPE)
         p.communicate(input=dump)
 
-    elif not args.no_flush:
+    elif dump and not args.no_flush:
         print 'flushing binlogs'
         MySQLdb.connect(**mysql_settings).cursor().execute('FLUSH LOGS')
 
@@ -137,8 +187,10 @@ def process_binlogevent(binlogevent):
         if isinstance(binlogevent, QueryEvent):
             if binlogevent.query != 'BEGIN': # BEGIN events don't matter
                 queries.append( (binlogevent.query, []) )
+        elif isinstance(binlogevent, XidEvent):
+            pass # Commit of the transaction, the rows were already applied
         else:
-            for row in binlogevent.rows:
+            for row in binlogevent.iter_rows():
                 if isinstance(binlogevent, WriteRowsEvent):
                     query = ('INSERT INTO {0}({1}) VALUES ({2})'.format(
                                 binlogevent.table,
@@ -166,3 +218,78 @@ def process_binlogevent(binlogevent):
 
         return queries
 
+def is_transaction_end(binlogevent):
+    """True if the changes before the given binlogevent are committed once it's applied"""
+    if isinstance(binlogevent, XidEvent):
+        return True
+    return isinstance(binlogevent, QueryEvent) and binlogevent.query != 'BEGIN'
+
+def load_schema_catalog(path, files, database):
+    """Returns the SchemaCatalog saved in path, after checking that it can
+    decode the binlog files on disk, or raises SchemaCatalogError
+
+    The catalog must have been saved by BinLogStreamReader with
+    schema_catalog_file, like by replicate.py --schema-catalog, at a
+    position at or before the first file, with no DDL on the database in
+    between. The files are decoded in parallel, each one with the catalog
+    as saved, so they can't change the tables of the database either:
+    apply the files before such a DDL, then save a new catalog to apply
+    the next ones
+    """
+    if not SchemaCatalog.saved(path):
+        raise SchemaCatalogError('{0} does not exist'.format(path))
+    start = (os.path.basename(files[0]), 4)
+    catalog = SchemaCatalog.from_file(path, *start)
+    if catalog.log_file is None:
+        raise SchemaCatalogError('{0} has no binlog position'.format(path))
+    catalog.check_position(*start)
+
+    # Only the DDL are read, the tables are all filtered out
+    reader = BinLogFileReader(files, schema_catalog=SchemaCatalog.from_file(path, *start),
+            only_events=[QueryEvent], only_tables=[])
+    probe = SchemaCatalog()
+    probe.tables = dict(catalog.tables)
+    for binlogevent in reader:
+        changed = probe.apply_query(binlogevent.schema, binlogevent.query)
+        if any(schema == database for schema, table in changed):
+            reader.close()
+            raise SchemaCatalogError('{0} at {1}:{2} changes the tables, apply the files before it first'.format(
+                binlogevent.query, binlogevent.log_file, binlogevent.log_pos))
+    reader.close()
+    return catalog
+
+def decode_binlog_file((path, catalog_path, database, raw_strings, log_pos)):
+    """Extracts the queries of a binlog file on disk, in a process of a pool
+
+    Returns a list with a (queries, (log_file, log_pos)) pair for each
+    transaction, the position being the one after the transaction
+    """
+    reader = BinLogFileReader(path, schema_catalog=catalog_path, log_pos=log_pos,
+            only_schemas=[database], raw_strings=raw_strings,
+            only_events=[DeleteRowsEvent, WriteRowsEvent, UpdateRowsEvent, QueryEvent, XidEvent])
+    transactions = []
+    queries = []
+    for binlogevent in reader:
+        queries.extend(process_binlogevent(binlogevent))
+        if is_transaction_end(binlogevent):
+            transactions.append((queries, (binlogevent.log_file, binlogevent.log_pos)))
+            queries = []
+    reader.close()
+    return transactions
+
+def decode_in_order(pool, tasks, window):
+    """Decodes the files of tasks with decode_binlog_file in a pool of
+    processes, and yields a (path, transactions) pair for each file in the
+    order of tasks
+
+    The transactions of a file wait in memory until the previous files are
+    yielded, so at most window files are decoded ahead
+    """
+    tasks = list(tasks)
+    pending = collections.deque()
+    while len(tasks) > 0 or len(pending) > 0:
+        while len(tasks) > 0 and len(pending) < window:
+            task = tasks.pop(0)
+            pending.append((task[0], pool.apply_async(decode_binlog_file, (task,))))
+        path, result = pending.popleft()
+        yield path, result.get(60 * 60 * 24)
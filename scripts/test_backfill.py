@@ -0,0 +1,117 @@
+# Copyright 2013 MemSQL, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use
+# this file except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations under the License.
+
+# Tests of the functions of backfill.py, on the binlog files of the MySQL
+# server of the pymysqlreplication tests. Run them from the scripts directory:
+#
+#     $ python -m unittest test_backfill
+
+from pymysqlreplication.tests import base
+from replication_utils import *
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+DATABASE = "pymysqlreplication_test"
+
+class TestBackfill(base.PyMySQLReplicationTestCase):
+    def setUp(self):
+        super(TestBackfill, self).setUp()
+        self.catalog_path = tempfile.mktemp()
+        self.execute("CREATE TABLE test (id INT NOT NULL AUTO_INCREMENT, data VARCHAR (50) NOT NULL, PRIMARY KEY (id))")
+        self.execute("INSERT INTO test (data) VALUES('Hello')")
+        self.execute("COMMIT")
+
+        # Saved at the CREATE TABLE, like by replicate.py --schema-catalog
+        stream = BinLogStreamReader(connection_settings = self.database, blocking = False,
+                schema_catalog_file = self.catalog_path)
+        for binlogevent in stream:
+            pass
+        stream.close()
+        self.execute("FLUSH LOGS")
+
+    def tearDown(self):
+        for path in [self.catalog_path, self.catalog_path + ".prev"]:
+            if os.path.exists(path):
+                os.remove(path)
+        super(TestBackfill, self).tearDown()
+
+    def insert(self, data):
+        '''Insert a row in its own binlog file and return the file'''
+        self.execute("INSERT INTO test (data) VALUES('%s')" % data)
+        self.execute("COMMIT")
+        cur = self.conn_control.cursor()
+        cur.execute("SHOW MASTER STATUS")
+        log_file = cur.fetchone()[0]
+        cur.execute("SELECT @@datadir")
+        datadir = cur.fetchone()[0]
+        self.execute("FLUSH LOGS")
+        return os.path.join(datadir, log_file)
+
+    def test_load_schema_catalog(self):
+        files = [self.insert("World")]
+
+        catalog = load_schema_catalog(self.catalog_path, files, DATABASE)
+        self.assertLess((catalog.log_file, catalog.log_pos), (os.path.basename(files[0]), 4))
+        columns = catalog.get(DATABASE, "test")
+        self.assertEqual([column["COLUMN_NAME"] for column in columns], ["id", "data"])
+
+    def test_load_schema_catalog_missing(self):
+        files = [self.insert("World")]
+
+        self.assertRaises(SchemaCatalogError, load_schema_catalog, self.catalog_path + ".missing", files, DATABASE)
+
+    def test_load_schema_catalog_ddl_in_files(self):
+        files = [self.insert("World")]
+        self.execute("ALTER TABLE test ADD COLUMN data2 VARCHAR (50)")
+        files.append(self.insert("Again"))
+
+        self.assertRaises(SchemaCatalogError, load_schema_catalog, self.catalog_path, files, DATABASE)
+
+    def test_decode_binlog_file(self):
+        path = self.insert("World")
+
+        transactions = decode_binlog_file((path, self.catalog_path, DATABASE, False, None))
+        self.assertEqual(len(transactions), 1)
+        queries, (log_file, log_pos) = transactions[0]
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0][0].startswith("INSERT INTO test("))
+        self.assertEqual(sorted(queries[0][1]), [2, "World"])
+        self.assertEqual(log_file, os.path.basename(path))
+        self.assertGreater(log_pos, 4)
+
+    def test_decode_binlog_file_from_position(self):
+        path = self.insert("World")
+        (queries, (log_file, log_pos)), = decode_binlog_file((path, self.catalog_path, DATABASE, False, None))
+
+        self.assertEqual(decode_binlog_file((path, self.catalog_path, DATABASE, False, log_pos)), [])
+
+    def test_decode_in_order(self):
+        values = ["one", "two", "three", "four", "five"]
+        files = [self.insert(data) for data in values]
+        tasks = [(path, self.catalog_path, DATABASE, False, None) for path in files]
+
+        pool = multiprocessing.Pool(2)
+        try:
+            decoded = list(decode_in_order(pool, tasks, 2))
+        finally:
+            pool.terminate()
+        self.assertEqual([path for path, transactions in decoded], files)
+        for data, (path, transactions) in zip(values, decoded):
+            self.assertEqual(len(transactions), 1)
+            queries, position = transactions[0]
+            self.assertIn(data, queries[0][1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+# Copyright 2013 MemSQL, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use
+# this file except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations under the License.
+
+# Tests of the checkpoints of the replication scripts. Run them from the
+# scripts directory:
+#
+#     $ python -m unittest test_checkpoint
+
+from checkpoint import Checkpoint, FileCheckpoint, TableCheckpoint
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import unittest
+
+class MemoryCheckpoint(Checkpoint):
+    def __init__(self, interval=1.0):
+        super(MemoryCheckpoint, self).__init__(interval)
+        self.saves = []
+
+    def load(self):
+        return self.saves[-1] if len(self.saves) > 0 else None
+
+    def _save(self, log_file, log_pos):
+        self.saves.append((log_file, log_pos))
+
+class TestCheckpoint(unittest.TestCase):
+    def test_abstract(self):
+        self.assertRaises(TypeError, Checkpoint)
+
+    def test_flush(self):
+        checkpoint = MemoryCheckpoint()
+        saved = []
+        checkpoint.on_save = lambda log_file, log_pos: saved.append((log_file, log_pos))
+        self.assertFalse(checkpoint.flush())
+
+        checkpoint.update("mysql-bin.000001", 100)
+        checkpoint.update("mysql-bin.000001", 200)
+        self.assertEqual(checkpoint.saves, [])
+        self.assertTrue(checkpoint.flush())
+        self.assertEqual(checkpoint.saves, [("mysql-bin.000001", 200)])
+        self.assertEqual(saved, [("mysql-bin.000001", 200)])
+
+        # Nothing new to write
+        self.assertFalse(checkpoint.flush())
+        self.assertEqual(len(checkpoint.saves), 1)
+
+    def test_thread(self):
+        checkpoint = MemoryCheckpoint(interval=0.01)
+        saved = threading.Event()
+        checkpoint.on_save = lambda log_file, log_pos: saved.set()
+        checkpoint.start()
+        checkpoint.update("mysql-bin.000001", 100)
+        saved.wait(5)
+        self.assertEqual(checkpoint.load(), ("mysql-bin.000001", 100))
+
+        # Written again by the thread only when the position changes
+        saved.clear()
+        time.sleep(0.05)
+        checkpoint.update("mysql-bin.000002", 4)
+        saved.wait(5)
+        self.assertEqual(checkpoint.saves, [("mysql-bin.000001", 100), ("mysql-bin.000002", 4)])
+        checkpoint.close()
+
+    def test_close(self):
+        checkpoint = MemoryCheckpoint(interval=60)
+        checkpoint.start()
+        checkpoint.update("mysql-bin.000001", 100)
+        start = time.time()
+        checkpoint.close()
+        # The thread doesn't wait for its next write to stop
+        self.assertLess(time.time() - start, 5)
+        self.assertIsNone(checkpoint._thread)
+        self.assertEqual(checkpoint.saves, [("mysql-bin.000001", 100)])
+
+class TestFileCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "checkpoint.json")
+        self.fsync = os.fsync
+        self.synced = []
+        def fsync(fd):
+            self.synced.append(stat.S_ISDIR(os.fstat(fd).st_mode))
+            self.fsync(fd)
+        os.fsync = fsync
+
+    def tearDown(self):
+        os.fsync = self.fsync
+        shutil.rmtree(self.dir)
+
+    def test_load_missing(self):
+        self.assertIsNone(FileCheckpoint(self.path).load())
+
+    def test_save(self):
+        checkpoint = FileCheckpoint(self.path)
+        checkpoint.update("mysql-bin.000001", 100)
+        checkpoint.close()
+
+        self.assertEqual(FileCheckpoint(self.path).load(), ("mysql-bin.000001", 100))
+        self.assertEqual(os.listdir(self.dir), ["checkpoint.json"])
+        # The file, then the directory of the rename
+        self.assertEqual(self.synced, [False, True])
+
+    def test_save_failed(self):
+        checkpoint = FileCheckpoint(self.path)
+        checkpoint.update("mysql-bin.000001", 100)
+        checkpoint.flush()
+
+        def fsync(fd):
+            raise OSError("fsync failed")
+        os.fsync = fsync
+        checkpoint.update("mysql-bin.000001", 200)
+        self.assertRaises(OSError, checkpoint.flush)
+        # The last position written is still whole
+        self.assertEqual(FileCheckpoint(self.path).load(), ("mysql-bin.000001", 100))
+
+class Connection(object):
+    """The calls of TableCheckpoint to a memsql_database.Connection, on a dict"""
+
+    def __init__(self):
+        self.rows = {}
+        self.queries = []
+
+    def query(self, query):
+        return [self.rows[1]] if 1 in self.rows else []
+
+    def execute(self, query, *parameters):
+        self.queries.append(query)
+        if query.startswith("REPLACE"):
+            self.rows[1] = {"log_file": parameters[0], "log_pos": parameters[1]}
+
+class TestTableCheckpoint(unittest.TestCase):
+    def test_save(self):
+        conn = Connection()
+        checkpoint = TableCheckpoint(conn, "replication_checkpoint")
+        self.assertIsNone(checkpoint.load())
+
+        checkpoint.update("mysql-bin.000001", 100)
+        checkpoint.flush()
+        checkpoint.update("mysql-bin.000001", 200)
+        checkpoint.close()
+
+        self.assertEqual(TableCheckpoint(conn, "replication_checkpoint").load(), ("mysql-bin.000001", 200))
+        # The table is created at the first write only
+        self.assertEqual([query.split()[0] for query in conn.queries], ["CREATE", "REPLACE", "REPLACE"])
+
+if __name__ == "__main__":
+    unittest.main()